@@ -0,0 +1,180 @@
+#-*- coding: utf-8 -*-
+"""
+Génération déterministe de corpus synthétiques pour les mesures de
+performance: une traduction de la bible au format XML attendu par
+"BibleParser.xml" (/bible/b/c/v, identifiés par un attribut "n") et des
+fichiers XMLittré (un fichier par lettre, une balise "<entree>" par
+mot-vedette).
+Un même germe ("seed") et une même taille produisent toujours le même
+corpus.
+"""
+
+__all__ = [
+    "books",
+    "vocabulary",
+    "number_words",
+    "generate_bible",
+    "generate_littre",
+    "write_bible",
+    "write_littre"
+]
+
+import os
+import random
+
+from xml.sax.saxutils import escape, quoteattr
+
+books = [
+    "Genèse", "Exode", "Lévitique", "Nombres", "Deutéronome", "Josué",
+    "Juges", "Ruth", "1 Samuel", "2 Samuel", "1 Rois", "2 Rois",
+    "1 Chroniques", "2 Chroniques", "Esdras", "Néhémie", "Esther", "Job",
+    "Psaumes", "Proverbes", "Ecclésiaste", "Cantique des cantiques", "Ésaïe",
+    "Jérémie", "Lamentations", "Ézéchiel", "Daniel", "Osée", "Joël", "Amos",
+    "Abdias", "Jonas", "Michée", "Nahum", "Habakuk", "Sophonie", "Aggée",
+    "Zacharie", "Malachie", "Matthieu", "Marc", "Luc", "Jean", "Actes",
+    "Romains", "1 Corinthiens", "2 Corinthiens", "Galates", "Éphésiens",
+    "Philippiens", "Colossiens", "1 Thessaloniciens", "2 Thessaloniciens",
+    "1 Timothée", "2 Timothée", "Tite", "Philémon", "Hébreux", "Jacques",
+    "1 Pierre", "2 Pierre", "1 Jean", "2 Jean", "3 Jean", "Jude",
+    "Apocalypse"
+]
+
+vocabulary = [
+    "Dieu", "Éternel", "Seigneur", "Israël", "peuple", "roi", "fils", "père",
+    "homme", "femme", "terre", "ciel", "eau", "esprit", "jour", "nuit",
+    "parole", "maison", "pain", "vie", "âme", "cœur", "main", "loi", "gloire",
+    "paix", "lumière", "ténèbres", "montagne", "ville", "prophète", "prêtre",
+    "temple", "autel", "alliance", "sacrifice", "péché", "grâce", "vérité",
+    "justice", "créa", "dit", "fut", "vit", "alla", "parla", "entendit",
+    "donna", "prit", "bénit", "soit", "était", "sera", "et", "la", "le",
+    "les", "de", "des", "du", "dans", "sur", "avec", "pour", "que", "qui",
+    "il", "ils", "elle", "tous", "car", "voici", "ainsi", "selon", "contre"
+]
+
+number_words = [
+    "un", "deux", "trois", "quatre", "cinq", "sept", "dix", "douze",
+    "quarante", "cinquante", "soixante-dix", "cent", "mille",
+    "vingt-deux", "trois cents", "quatre mille"
+]
+
+# catégories grammaticales des entrées du Littré
+_natures = ["s. m.", "s. f.", "v. a.", "v. n.", "adj.", "adv.", "prép."]
+
+def _generate_verse(rng):
+    """
+    Génère le texte d'un verset: des mots du vocabulaire, quelques nombres en
+    lettres ou en chiffres et, rarement, une numérotation secondaire.
+    """
+    words = []
+    if rng.random() < 0.02:
+        words.append("({}:{})".format(rng.randint(1, 50), rng.randint(1, 40)))
+    for i in range(rng.randint(6, 30)):
+        r = rng.random()
+        if r < 0.05:
+            words.append(rng.choice(number_words))
+        elif r < 0.07:
+            words.append(str(rng.randint(1, 5000)))
+        else:
+            words.append(rng.choice(vocabulary))
+    text = " ".join(words)
+    return text[0].upper() + text[1:] + rng.choice([".", ".", ";", ":", "!"])
+
+def generate_bible(n_books=66, n_chapters=25, n_verses=25, seed=0):
+    """
+    Génère le contenu XML d'une traduction de la bible comptant au plus
+    "n_books" livres, chacun d'au plus "n_chapters" chapitres d'au plus
+    "n_verses" versets (le nombre exact variant d'un livre et d'un chapitre à
+    l'autre).
+    """
+    rng = random.Random(seed)
+    lines = ['<?xml version="1.0" encoding="utf-8"?>', "<bible>"]
+    for book in books[:n_books]:
+        lines.append("<b n={}>".format(quoteattr(book)))
+        for chapter in range(1, rng.randint(max(1, n_chapters // 2),
+                                            n_chapters) + 1):
+            lines.append('<c n="{}">'.format(chapter))
+            for verse in range(1, rng.randint(max(1, n_verses // 2),
+                                              n_verses) + 1):
+                lines.append('<v n="{}">{}</v>'.format(
+                    verse,
+                    escape(_generate_verse(rng))
+                ))
+            lines.append("</c>")
+        lines.append("</b>")
+    lines.append("</bible>")
+    return "\n".join(lines) + "\n"
+
+def _generate_headword(rng, letter):
+    """
+    Génère un mot-vedette commençant par une lettre.
+    """
+    syllables = ["ba", "ce", "di", "fo", "gu", "la", "mé", "nè", "pi", "ro",
+                 "sa", "té", "vo", "an", "on", "eu", "ou", "in", "ar", "es"]
+    word = letter + "".join(
+        rng.choice(syllables) for i in range(rng.randint(1, 4))
+    )
+    return word.upper()
+
+def generate_littre(n_entries=20000, seed=0):
+    """
+    Génère des fichiers XMLittré comptant au total environ "n_entries"
+    entrées, réparties entre les lettres de l'alphabet; certains
+    mots-vedettes ont plusieurs entrées (plusieurs sens).
+    Retourne un dictionnaire associant le nom de chaque fichier à son
+    contenu.
+    """
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    files = {}
+    for letter in letters:
+        headwords = sorted(set(
+            _generate_headword(rng, letter)
+            for i in range(max(1, n_entries // len(letters)))
+        ))
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<xmlittre lettre="{}">'.format(letter)
+        ]
+        for headword in headwords:
+            for sense in range(1, (2 if rng.random() < 0.05 else 1) + 1):
+                variants = "".join(
+                    '<variante num="{}">{}</variante>'.format(
+                        v,
+                        escape(" ".join(
+                            rng.choice(vocabulary)
+                            for i in range(rng.randint(8, 60))
+                        ))
+                    )
+                    for v in range(1, rng.randint(1, 6) + 1)
+                )
+                lines.append(
+                    '<entree terme={} sens="{}"><entete><prononciation>{}'
+                    '</prononciation><nature>{}</nature></entete>'
+                    '<corps>{}</corps></entree>'.format(
+                        quoteattr(headword),
+                        sense,
+                        headword.lower(),
+                        rng.choice(_natures),
+                        variants
+                    )
+                )
+        lines.append("</xmlittre>")
+        files[letter + ".xml"] = "\n".join(lines) + "\n"
+    return files
+
+def write_bible(path, *args, **kwargs):
+    """
+    Écrit une traduction générée (voir "generate_bible") dans un fichier.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(generate_bible(*args, **kwargs))
+
+def write_littre(directory, *args, **kwargs):
+    """
+    Écrit des fichiers XMLittré générés (voir "generate_littre") dans un
+    répertoire.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, content in generate_littre(*args, **kwargs).items():
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(content)
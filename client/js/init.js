@@ -97,6 +97,7 @@ var aLetterRegex = "[a-zA-Z" + accentMapping.join("") + "]";
 var startsWithALetterRegex = new RegExp("^"+aLetterRegex);
 var endWithALetterRegex = new RegExp(aLetterRegex+"$");
 var isAWordReqex = new RegExp("^"+aLetterRegex+"+$");
+var notALetterRegex = new RegExp("[^'a-zA-Z" + accentMapping.join("") + "]+");
 
 /*
  * Récupère divers noeuds HTML dans des variables globales.
@@ -233,8 +233,8 @@ function requestServerForMoreTranslation()
         // utilise comme référence centrale celle qui avait été sélectionnée
         "ref": lastContextualQueryReference.serialize(),
         "tok": "context",
-        // utilise la traduction alternative
-        "tra": compareTranslation
+        // ajoute la traduction alternative, alignée sur celle de la recherche
+        "tra": [lastTranslationUsed, compareTranslation]
     };
     var jsonData = JSON.stringify(dict);
     s.send(jsonData);
@@ -255,11 +255,11 @@ function requestServerForContext(ref)
         "now": new Date().getTime(),
         "ref": ref,
         "tok": "context",
-        "tra": lastTranslationUsed
+        "tra": [lastTranslationUsed]
     };
     // Ajoute en même temps une demande de comparaison de traduction
     if (compareTranslation) {
-       dict["cmp"] = compareTranslation;
+       dict["tra"].push(compareTranslation);
     }
     var jsonData = JSON.stringify(dict);
     s.send(jsonData);
@@ -280,7 +280,7 @@ function requestServerForContext(ref)
 function handleContextResponse(res)
 {
     displayedContextList = {};
-    var text;
+    var text, displayedText = "";
     for (var translation in res) {
         if (translation == lastTranslationUsed) {
             referenceTranslationCell.clear();
@@ -301,6 +301,9 @@ function handleContextResponse(res)
                         verse,
                         text
                     );
+                    if (isReferenceTranslation(translation)) {
+                        displayedText += " " + text;
+                    }
                 }
             }
         }
@@ -311,6 +314,8 @@ function handleContextResponse(res)
         hideCmpTranslation();
     }
     showContextTab();
+    // les définitions des mots affichés sont demandées par avance
+    prefetchDictionnary(displayedText);
     // à cet instant, cette variable désigne le noeud <blockquote> du verset
     // clé
     if (lastContextualQueryBlockQuote) {
@@ -22,12 +22,24 @@
  *  MA 02110-1301, USA.
  */
 
+// Définitions déjà reçues (représentation XML, ou null pour un mot sans
+// entrée), par mot
+var dictionnaryCache = {};
+
 /*
- * Procède à une demande de définition dans le dictionnaire.
+ * Procède à une demande de définition dans le dictionnaire, à moins qu'elle
+ * n'ait déjà été reçue.
  */
  
 function requestServerForDictionnary(word)
 {
+    if (dictionnaryCache[word]) {
+        var parser = new DOMParser();
+        handleDictionnaryResponse(
+            parser.parseFromString(dictionnaryCache[word], "text/xml")
+        );
+        return;
+    }
     if (!s) return;
     var dict = {
         "now": new Date().getTime(),
@@ -38,6 +50,47 @@ function requestServerForDictionnary(word)
     s.send(jsonData);
 }
 
+/*
+ * Demande en un seul message les définitions de tous les mots d'un texte (par
+ * exemple des versets affichés) qui n'ont pas encore été reçues.
+ */
+
+function prefetchDictionnary(text)
+{
+    if (!s) return;
+    var words = [], seen = {};
+    var candidates = text.split(notALetterRegex);
+    for (var i=0, word; i < candidates.length; ++i) {
+        // Enlève éventuellement la particule précédent le mot
+        word = candidates[i].replace(/^[a-zA-Z]'/, "");
+        if (!isAWordReqex.test(word) || word in seen ||
+            word in dictionnaryCache)
+        {
+            continue;
+        }
+        seen[word] = true;
+        words.push(word);
+    }
+    if (!words.length) return;
+    var dict = {
+        "now": new Date().getTime(),
+        "tok": "dictionnary",
+        "words": words
+    };
+    s.send(JSON.stringify(dict));
+}
+
+/*
+ * Conserve les définitions reçues en réponse à "prefetchDictionnary".
+ */
+
+function handleDictionnaryBatchResponse(res)
+{
+    for (var word in res) {
+        dictionnaryCache[word] = res[word];
+    }
+}
+
 /*
  * Ajouter un titre de table (sens n°1, 2, etc...)
  */
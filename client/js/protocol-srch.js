@@ -22,6 +22,20 @@
  *  MA 02110-1301, USA.
  */
 
+/*
+ * Nombre de versets par morceau de réponse lors d'une recherche.
+ */
+
+var searchChunkSize = 100;
+
+/*
+ * Identifiant de la dernière recherche envoyée, et indicateur de son
+ * achèvement (dernier morceau reçu ou annulation).
+ */
+
+var searchRequestId = null;
+var searchEnded = true;
+
 /*
  * Manipulations DOM.
  */
@@ -48,6 +62,12 @@ function requestServerForSearch()
 {
     if (!s) return;
     saveFormState();
+    // la recherche précédente, d'un autre identifiant, n'est pas remplacée
+    // d'elle-même par le serveur
+    if (!searchEnded) {
+        s.send(JSON.stringify({"tok": "cancel", "id": searchRequestId}));
+    }
+    searchEnded = false;
     var dict = {
         "now": new Date().getTime(),
         "ref": [],
@@ -55,6 +75,8 @@ function requestServerForSearch()
         "bou": filterForm.elements["mot"].checked,
         "cas": filterForm.elements["case"].checked,
         "acc": filterForm.elements["accent"].checked,
+        "str": searchChunkSize,
+        "id": searchRequestId = nextRequestId(),
         "tok": "search"
     };
     lastTranslationUsed = filterForm.elements["traduction"].value;
@@ -96,16 +118,31 @@ function requestServerForSearch()
 
 /*
  * Fonction de manipulation des réponses du serveur concernant les recherches.
+ * Les résultats arrivent par morceaux numérotés (clée "seq"): le premier
+ * morceau efface les résultats précédents, le dernier porte la clée "end".
+ * Une recherche annulée se termine par une réponse portant la clée
+ * "cancelled". Les réponses à une recherche précédente sont ignorées.
  */
 
-function handleSearchResponse(res)
+function handleSearchResponse(resp)
 {
-    cleanSearchList();
+    if ("id" in resp && resp["id"] != searchRequestId) return;
+    if (resp["cancelled"]) {
+        searchEnded = true;
+        return;
+    }
+    var res = resp["res"];
+    if (!("seq" in resp) || resp["seq"] == 0) {
+        cleanSearchList();
+    }
     for (var i=0, ref; i < res.length; ++i) {
         ref = res[i];
         addVerseToSearchList(ref["ref"], ref["verse"]);
     }
-    toggleCleanButton();
+    if (!("seq" in resp) || resp["end"]) {
+        searchEnded = true;
+        toggleCleanButton();
+    }
 }
 
 /*
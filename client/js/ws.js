@@ -37,6 +37,21 @@ var ress = "/bible";
 // représente la connexion websocket
 var s;
 
+// dernier identifiant de requête attribué
+var lastRequestId = 0;
+
+/*
+ * Attribue un identifiant à une requête. Le serveur le renvoie dans sa
+ * réponse (clée "id"), ce qui permet de reconnaitre une réponse périmée: les
+ * requêtes portant un identifiant sont traitées simultanément par le serveur,
+ * et leurs réponses peuvent arriver dans le désordre.
+ */
+
+function nextRequestId()
+{
+    return ++lastRequestId;
+}
+
 /*
  * Fonction déclenchée lorsque la connexion est attestée.
  */
@@ -66,7 +81,7 @@ function handleMessage(e)
     switch (resp["tok"]) {
     // Retour d'une recherche
     case "search":
-        handleSearchResponse(resp["res"]);
+        handleSearchResponse(resp);
         break;
     // Retour d'une demande de versets
     case "context":
@@ -74,6 +89,11 @@ function handleMessage(e)
         break;
     // Retour d'une demande de définition
     case "dictionnary":
+        // Définitions demandées par avance
+        if (typeof(resp["res"]) == "object") {
+            handleDictionnaryBatchResponse(resp["res"]);
+            break;
+        }
         var parser = new DOMParser();
         var dom = parser.parseFromString(resp["res"], "text/xml");
         handleDictionnaryResponse(dom);
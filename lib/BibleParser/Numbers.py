@@ -1,7 +1,12 @@
 #-*- coding: utf-8 -*-
 
+import re
+
+from functools import lru_cache
 from math import log10
 
+from BibleParser.folding import fold
+
 class Number:
     """
     Convertit un entier naturel en son équivalent textuel (sous la base 10).
@@ -45,7 +50,7 @@ class Number:
         "vingt",
         "trente",
         "quarante",
-        "cinqante",
+        "cinquante",
         "soixante",
         "soixante-dix",
         "quatre-vingt",
@@ -152,3 +157,152 @@ class Number:
         if self.representation is None:
             self.representation = self.parse()
         return self.representation
+
+
+# valeur de chaque mot entrant dans l'écriture d'un nombre, les formes au
+# pluriel étant ramenées à leur singulier (voir "find_numbers")
+_number_words = dict(
+    [(w, n) for n, w in enumerate(Number._dizains[:17])] +
+    [(w, 10*n) for n, w in enumerate(Number._dizains_units[:7]) if n > 1] +
+    [("cent", 100), ("mille", 1000), ("million", 10**6),
+     ("milliard", 10**9), ("et", None)]
+)
+
+_number_plurals = {
+    "vingts": "vingt",
+    "cents": "cent",
+    "millions": "million",
+    "milliards": "milliard"
+}
+
+# Masque de découpage d'un texte en mots
+_regex_match_word = re.compile(r"\w+")
+
+# vocabulaires des nombres repliés, par combinaison de sensibilités
+_number_vocabularies = {}
+
+def _get_number_vocabulary(case_sensitive, accent_sensitive):
+    """
+    Retourne un dictionnaire associant chaque mot d'un nombre, replié selon les
+    sensibilités données, à sa forme de référence.
+    """
+    key = (case_sensitive, accent_sensitive)
+    if key not in _number_vocabularies:
+        vocabulary = {}
+        for w in _number_words:
+            vocabulary[fold(w, case_sensitive, accent_sensitive)] = w
+        for w, singular in _number_plurals.items():
+            vocabulary[fold(w, case_sensitive, accent_sensitive)] = singular
+        _number_vocabularies[key] = vocabulary
+    return _number_vocabularies[key]
+
+@lru_cache(maxsize=4096)
+def _get_canonical_words(n):
+    """
+    Retourne la suite de mots de l'écriture textuelle d'un nombre.
+    """
+    return tuple(str(Number(n)).replace("-", " ").split(" "))
+
+def _get_words_value(words):
+    """
+    Calcule la valeur d'une suite de mots de référence, sans vérifier qu'elle
+    forme un nombre correctement écrit.
+    """
+    total = 0
+    current = 0
+    previous = None
+    for w in words:
+        if w == "cent":
+            current = (current or 1) * 100
+        elif w in ("mille", "million", "milliard"):
+            total += (current or 1) * _number_words[w]
+            current = 0
+        elif w == "vingt" and previous == "quatre":
+            # quatre-vingt
+            current += 76
+        elif w != "et":
+            current += _number_words[w]
+        previous = w
+    return total + current
+
+def _parse_number_words(run):
+    """
+    Reconnait les nombres d'une suite de mots consécutifs, donnés sous la
+    forme de triplets (mot de référence, début, fin).
+    Une suite ne forme un nombre que si elle correspond exactement à
+    l'écriture de sa valeur (voir "Number"); lorsque la suite entière n'en
+    forme pas un, elle est découpée au niveau des "et", en retenant à chaque
+    fois le plus long morceau formant un nombre.
+    """
+    # morceaux de la suite délimités par "et", sous la forme d'intervalles
+    # d'indices
+    pieces = []
+    start = 0
+    for i, (w, s, e) in enumerate(run + [("et", None, None)]):
+        if w == "et":
+            if i > start:
+                pieces.append((start, i))
+            start = i + 1
+    i = 0
+    while i < len(pieces):
+        for j in range(len(pieces), i, -1):
+            words = run[pieces[i][0]:pieces[j-1][1]]
+            value = _get_words_value(w for w, s, e in words)
+            if _get_canonical_words(value) == tuple(w for w, s, e in words):
+                yield (value, words[0][1], words[-1][2])
+                i = j
+                break
+        else:
+            i += 1
+
+def find_numbers(text, case_sensitive=False, accent_sensitive=False):
+    """
+    Reconnait les nombres d'un texte, écrits en chiffres ou en lettres, ce
+    dernier étant replié selon les sensibilités données (voir
+    "BibleParser.folding").
+    Un nombre écrit en lettres est une suite de mots séparés par un espace ou
+    un tiret; un nombre faisant partie d'un plus grand nombre n'est pas
+    reconnu à part. Lorsque la casse est prise en compte, une suite dont le
+    premier mot n'est un mot de nombre qu'au mépris de la casse ("Trois
+    cents") est écartée en entier.
+    Est un itérateur sur les triplets (valeur, début, fin) des nombres
+    trouvés, dans l'ordre du texte.
+    """
+    vocabulary = _get_number_vocabulary(case_sensitive, accent_sensitive)
+    insensitive = _get_number_vocabulary(False, accent_sensitive) \
+        if case_sensitive else None
+    run = []
+    # fin du dernier mot d'une suite écartée
+    skipped = None
+    for m in _regex_match_word.finditer(text):
+        word = m.group()
+        if word in vocabulary:
+            # la suite d'un nombre écarté n'est pas lue comme un autre nombre
+            if skipped is not None and m.start() == skipped + 1 and \
+               text[skipped] in " -":
+                skipped = m.end()
+                continue
+            skipped = None
+            # un mot suivant le précédent à plus d'un séparateur commence un
+            # autre nombre
+            if run and (m.start() != run[-1][2] + 1 or
+                        text[run[-1][2]] not in " -"):
+                yield from _parse_number_words(run)
+                run = []
+            run.append((vocabulary[word], m.start(), m.end()))
+            continue
+        skipped = None
+        if run:
+            yield from _parse_number_words(run)
+            run = []
+        # premier mot d'un nombre ne respectant pas la casse
+        if insensitive is not None and _number_words.get(
+                insensitive.get(fold(word, False, accent_sensitive))
+                ) is not None:
+            skipped = m.end()
+            continue
+        # nombre écrit en chiffres, sans zéro superflu
+        if word.isdecimal() and str(int(word)) == word:
+            yield (int(word), m.start(), m.end())
+    if run:
+        yield from _parse_number_words(run)
@@ -7,7 +7,8 @@ import re
 import xml.etree.ElementTree as ET
 
 from BibleParser.error import *
-from BibleParser.Numbers import Number
+from BibleParser.folding import fold, compile_keyword_regex, \
+    compile_expression_regex
 
 class parser:
     """
@@ -15,26 +16,19 @@ class parser:
     Permet de rechercher par références et par mots-clés simultanément.
     """
 
-    _accent_mapping = [
-        "ÀÁÂÄÆA",
-        "àáâäæa",
-        "ÈÉÊËE",
-        "èéêëe",
-        "ÌÍÎÏI",
-        "ìíîïi",
-        "ÑN",
-        "ñn",
-        "ÒÓÔÖO",
-        "òóôöo",
-        "ÙÚÛÜU",
-        "ùúûüu"
-    ]
-
     _mandatory_keywords = []
     _one_of_keywords    = []
     _none_of_keywords   = []
     _number_ranges      = []
     _exact_expressions  = []
+    _proximities        = []
+
+    # mots-clés sous leur forme d'origine, dans le même ordre que les
+    # expressions régulières compilées
+    _mandatory_sources  = []
+    _one_of_sources     = []
+    _none_of_sources    = []
+    _exact_sources      = []
     
     references = {}
     
@@ -43,122 +37,47 @@ class parser:
     _word_boundary      = True
     _highlight_prefix   = None
 
-    _regexp_avoid_number_overlapping_before = None
-    _regexp_avoid_number_overlapping_after  = None
-    _regex_match_space_dash = None
+    # Masque de détection d'une indication de numérotation secondaire dans un
+    # verset
+    _regex_match_alter_verse = re.compile(r"\(\d+[.:-]\d+\) ?")
 
     def __init__(self):
-        # Compile diverses expressions régulières
-        self._build_regular_expressions()
+        # Les attributs de classe ne sont que des valeurs par défaut: l'état
+        # d'une recherche est propre à chaque instance, de sorte que plusieurs
+        # parseurs puissent servir des requêtes en parallèle
+        self.references = {}
+        self._mandatory_keywords = []
+        self._one_of_keywords    = []
+        self._none_of_keywords   = []
+        self._number_ranges      = []
+        self._exact_expressions  = []
+        self._proximities        = []
+        self._mandatory_sources  = []
+        self._one_of_sources     = []
+        self._none_of_sources    = []
+        self._exact_sources      = []
     
-    def _build_regular_expressions(self):
-        """
-        Compile diverses expressions régulières utiles pour le traitement des
-        versets.
-        """
-        # compile deux expressions régulières permettant d'éviter de capturer un
-        # nombre faisant partie d'un plus grand nombre
-        rb = ""
-        ra = ""
-        for s in Number.all_digits:
-            rb += "(?<!" + s + "[ -])"
-            ra += "(?![ -]" + s + ")"
-        self._regexp_avoid_number_overlapping_before = rb
-        self._regexp_avoid_number_overlapping_after  = ra
-        # compile une expression régulière permettant de détecter et de
-        # supprimer une indication de numérotation secondaire dans un verset
-        self._regex_match_alter_verse = re.compile("\(\d+[.:-]\d+\) ?")
-        # compile une expression régulière permettant de détecter un espace ou
-        # un tiret
-        self._regex_match_space_dash = re.compile("[ -]")
-
-    def _verse_match_rules(self, verse):
-        """
-        Cherche à reconnaitre au moins un mot-clé dans le verset donné en
-        argument.
-        L'argument est une chaîne.
-        TODO if faut fusionner "_verse_match_rules" et "_prefix_matches" pour améliorer les perfs.
-        """
-        # mots étants _tous_ obligatoires
-        for r in self._mandatory_keywords:
-            if not r.search(verse):
-                return False
-        # mots dont au moins un est nécessaire
-        if len(self._one_of_keywords) > 0:
-            one_found = False
-            for r in self._one_of_keywords:
-                if r.search(verse):
-                    one_found = True
-                    break
-            if not one_found:
-                return False
-        # mots interdits
-        for r in self._none_of_keywords:
-            if r.search(verse):
-                return False
-        return True
-
-    def _prefix_matches(self, text):
-        """
-        Ajoute aux mots-clés trouvés dans le texte un préfixe et un suffixe.
-        """
-        p = self._highlight_prefix + r"\1" + self._highlight_prefix
-        # mots étants _tous_ obligatoires
-        for r in self._mandatory_keywords:
-            text = r.sub(p, text)
-        # mots dont au moins un est nécessaire
-        if len(self._one_of_keywords) > 0:
-            for r in self._one_of_keywords:
-                text = r.sub(p, text)
-        return text
+    def _fold(self, s):
+        """
+        Replie la casse et/ou les accents d'une chaîne selon les sensibilités
+        courantes du parseur.
+        """
+        return fold(s, self._case_sensitive, self._accent_sensitivity)
 
-    def _compile_keyword_regex(self, s):
+    def _compile_keyword_regex(self, s, word_boundary=None):
         """
         Compile une expression régulière détectant un mot délimité, avec ou sans
         sensibilité à la case.
-        """
-        s = re.escape(s)
-        # Permet de passer outre les accents
-        if not self._accent_sensitivity:
-            for accents in self._accent_mapping:
-                p = "["+accents+"]"
-                # la fonction re.escape ajoute des '\' avant les accents
-                s = re.sub("\\\?"+p, p, s)
-        # Délimite le mot à chercher
-        if self._word_boundary:
-            s = r"\b"+s+r"\b"
-        # Capture du mot dans un groupe
-        s = "("+s+")"
-        if self._case_sensitive:
-            return re.compile(s)
-        else:
-            return re.compile(s, re.I)
-    
-    def _compile_range_regex(self, low, high):
-        """
-        Compile une expression régulière capable de détecter tout nombre compris
-        dans un intervalle, sois dans sa représentation numérique, sois dans sa
-        représentation textuelle.
-        """
-        if high == -1:
-            ran = (low,)
-        else:
-            ran = range(low, high+1)
-        values = []
-        for n in ran:
-            values.append(str(n))
-            litteral_number = str(Number(n))
-            # ne fait pas de différence entre les tirets et les espaces
-            litteral_number = self._regex_match_space_dash.sub("[ -]", litteral_number)
-            values.append(litteral_number)
-        # évite le recoupemement par l'arrière
-        numbers = self._regexp_avoid_number_overlapping_before
-        # un OU entre chaque chiffre ou nombre textuel contenu dans l'intervalle
-        # et délimité par un séparateur de mot
-        numbers += r"\b("+("|".join(values))+r")\b"
-        # évite le recoupemement par l'avant
-        numbers += self._regexp_avoid_number_overlapping_after
-        return re.compile(numbers)
+        La délimitation du mot peut être forcée par le second argument.
+        """
+        if word_boundary is None:
+            word_boundary = self._word_boundary
+        return compile_keyword_regex(
+            s,
+            self._case_sensitive,
+            self._accent_sensitivity,
+            word_boundary
+        )
     
     def add_mandatory_keywords(self, words):
         """
@@ -167,6 +86,7 @@ class parser:
         self._mandatory_keywords.extend([
             self._compile_keyword_regex(x) for x in words
         ])
+        self._mandatory_sources.extend(words)
 
     def add_one_of_keywords(self, words):
         """
@@ -175,6 +95,7 @@ class parser:
         self._one_of_keywords.extend([
             self._compile_keyword_regex(x) for x in words
         ])
+        self._one_of_sources.extend(words)
 
     def add_none_of_keywords(self, words):
         """
@@ -183,14 +104,38 @@ class parser:
         self._none_of_keywords.extend([
             self._compile_keyword_regex(x) for x in words
         ])
+        self._none_of_sources.extend(words)
     
     def add_exact_expression(self, expr):
         """
-        Ajoute une expression exacte à rechercher.
-        """
-        # Les expressions exactes sont recherchées de la même manière que les
-        # mots dont un seul est nécessaire
-        self._one_of_keywords.append(self._compile_keyword_regex(expr))
+        Ajoute une expression exacte à rechercher: une suite de mots
+        consécutifs, obligatoire au même titre que les mots-clés tous
+        obligatoires.
+        """
+        # Les expressions exactes sont reconnues par l'index positionnel (voir
+        # "BibleParser.index"), l'expression régulière ne servant qu'à les
+        # vérifier et à les mettre en surbrillance
+        self._exact_expressions.append(compile_expression_regex(
+            expr,
+            self._case_sensitive,
+            self._accent_sensitivity,
+            self._word_boundary
+        ))
+        self._exact_sources.append(expr)
+
+    def add_proximity(self, words, distance, cross_verses=False):
+        """
+        Ajoute un groupe de mots à rechercher à proximité les uns des autres:
+        tous les mots doivent apparaitre à au plus "distance" mots d'écart
+        (1 pour des mots voisins, dans n'importe quel ordre).
+        Si "cross_verses" est vrai, les mots peuvent se trouver dans des
+        versets voisins d'un même chapitre; tous les versets concernés sont
+        alors retournés.
+        Les mots sont toujours des mots entiers.
+        """
+        if not isinstance(distance, int) or distance < 1:
+            raise ValueError("expect a positive distance")
+        self._proximities.append((tuple(words), distance, bool(cross_verses)))
     
     def add_number_in_range(self, low, high=-1):
         """
@@ -201,9 +146,12 @@ class parser:
         if high != -1:
             if high <= low:
                 raise ValueError("the range is not valid")
-        # Les nombres sont recherchées de la même manière que les mots dont un
-        # seul est nécessaire
-        self._one_of_keywords.append(self._compile_range_regex(low, high))
+        # Les nombres sont recherchés de la même manière que les mots dont un
+        # seul est nécessaire, mais reconnus par l'index (voir
+        # "BibleParser.index") plutôt que par une expression régulière
+        if high == -1:
+            high = low
+        self._number_ranges.append((low, high))
     
     def set_case_sensitivity(self, sensitive):
         """
@@ -232,6 +180,12 @@ class parser:
         self._one_of_keywords.clear()
         self._none_of_keywords.clear()
         self._number_ranges.clear()
+        self._exact_expressions.clear()
+        self._proximities.clear()
+        self._mandatory_sources.clear()
+        self._one_of_sources.clear()
+        self._none_of_sources.clear()
+        self._exact_sources.clear()
     
     def enable_highlighting(self, s):
         """
@@ -246,6 +200,28 @@ class parser:
         """
         self._highlight_prefix = None
 
+    def get_query(self):
+        """
+        Compile l'état courant du parseur (références, mots-clés, options) en
+        une requête immuable (voir "BibleParser.query"), qui peut ensuite être
+        exécutée indépendamment du parseur, depuis n'importe quel thread.
+        """
+        from BibleParser.query import query
+        return query(
+            [(r.book, r.chapter_low, r.chapter_high, r.verse_low, r.verse_high)
+             for r in self.references.values()],
+            zip(self._mandatory_keywords, self._mandatory_sources),
+            zip(self._one_of_keywords, self._one_of_sources),
+            zip(self._none_of_keywords, self._none_of_sources),
+            self._number_ranges,
+            zip(self._exact_expressions, self._exact_sources),
+            self._proximities,
+            self._case_sensitive,
+            self._accent_sensitivity,
+            self._word_boundary,
+            self._highlight_prefix
+        )
+
     def __iter__(self):
         """
         À implémenter dans une classe fille.
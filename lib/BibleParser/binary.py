@@ -0,0 +1,259 @@
+#-*- coding: utf-8 -*-
+"""
+Format binaire compact d'une traduction de la bible.
+Un fichier binaire contient, déjà calculés, le texte des versets, les tables
+d'adressage des livres et des chapitres, le texte replié, l'index inversé
+(positionnel) et la table des nombres.
+Il est projeté en mémoire ("mmap") au chargement: rien n'est analysé ni
+recopié, les pages étant lues à la demande et partagées par le cache du
+système entre tous les processus qui projettent le même fichier.
+
+Organisation (entiers non signés, dans l'ordre d'octets de la machine):
+    ° en-tête: signature (8 octets), version (4 octets), ordre des octets
+      ("l" ou "b", 1 octet), 3 octets de bourrage, nombre de sections (4
+      octets)
+    ° table des sections: nom (16 octets), décalage (8 octets) et longueur
+      (8 octets) de chaque section
+    ° sections, alignées sur 8 octets
+"""
+
+__all__ = ["dump", "load", "check"]
+
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+
+from BibleParser.error import *
+from BibleParser.index import index
+from BibleParser.store import store
+
+_magic = b"BIBLEBIN"
+_version = 3
+
+_header = struct.Struct("=8sIc3xI")
+_section = struct.Struct("=16sQQ")
+
+# sections constituées d'entiers, recopiées telles quelles depuis le stockage
+_array_sections = (
+    "book_chapters",
+    "chapter_numbers",
+    "chapter_books",
+    "chapter_verses",
+    "verse_numbers",
+    "verse_chapters"
+)
+
+class _text_table:
+    """
+    Une table de textes projetée en mémoire: les textes, encodés en UTF-8,
+    sont mis bout à bout et délimités par une table de décalages. Chaque texte
+    n'est décodé qu'au moment où il est demandé.
+    """
+
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self._data[self._offsets[i]:self._offsets[i+1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+def _encode_texts(texts):
+    """
+    Encode une suite de textes en une paire (données, décalages).
+    """
+    data = bytearray()
+    offsets = array("I", (0,))
+    for t in texts:
+        data += t.encode("utf-8")
+        offsets.append(len(data))
+    return (bytes(data), offsets)
+
+def dump(bible_store, path):
+    """
+    Écrit le stockage d'une traduction dans un fichier binaire.
+    L'index inversé est construit si ce n'est déjà fait.
+    """
+    sections = []
+    for name in _array_sections:
+        sections.append((name, getattr(bible_store, name)))
+    sections.append(("books", "\n".join(bible_store.books).encode("utf-8")))
+    # adresses ne respectant pas une numérotation dense, sous la forme de
+    # triplets (livre, chapitre, ligne) et (ligne, verset, identifiant)
+    sparse_chapters = array("I")
+    for (book_id, chapter_index), row in bible_store._sparse_chapters.items():
+        sparse_chapters.extend((book_id, chapter_index, row))
+    sections.append(("sparse_chapters", sparse_chapters))
+    sparse_verses = array("I")
+    for (row, verse_index), verse_id in bible_store._sparse_verses.items():
+        sparse_verses.extend((row, verse_index, verse_id))
+    sections.append(("sparse_verses", sparse_verses))
+    # texte d'origine et texte replié
+    data, offsets = _encode_texts(bible_store.texts)
+    sections.append(("text_offsets", offsets))
+    sections.append(("texts", data))
+    data, offsets = _encode_texts(bible_store.get_folded_texts(False, False))
+    sections.append(("folded_offsets", offsets))
+    sections.append(("folded_texts", data))
+    # index inversé: vocabulaire, puis listes de versets mises bout à bout,
+    # et rangs des occurrences de chaque terme dans chaque verset de sa liste
+    # (délimités par une table de décalages parallèle aux listes de versets)
+    terms = []
+    postings_offsets = array("I", (0,))
+    postings = array("I")
+    position_offsets = array("I", (0,))
+    positions = array("I")
+    idx = bible_store.get_index()
+    for term, verse_ids, offsets, values in idx.positional_items():
+        terms.append(term)
+        postings.extend(verse_ids)
+        postings_offsets.append(len(postings))
+        for i in range(len(verse_ids)):
+            positions.extend(values[offsets[i]:offsets[i+1]])
+            position_offsets.append(len(positions))
+    sections.append(("terms", "\n".join(terms).encode("utf-8")))
+    sections.append(("postings_offsets", postings_offsets))
+    sections.append(("postings", postings))
+    sections.append(("position_offsets", position_offsets))
+    sections.append(("positions", positions))
+    sections.append(("verse_lengths", idx.verse_lengths))
+    # table des nombres: valeurs triées et versets correspondants
+    sections.append(("number_values", idx.number_values))
+    sections.append(("number_verses", idx.number_verses))
+    # écriture
+    with open(path, "wb") as f:
+        f.write(_header.pack(
+            _magic,
+            _version,
+            sys.byteorder[0].encode("ascii"),
+            len(sections)
+        ))
+        offset = _header.size + _section.size * len(sections)
+        table = []
+        for name, content in sections:
+            content = bytes(content)
+            offset += -offset % 8
+            table.append((name, offset, content))
+            offset += len(content)
+        for name, offset, content in table:
+            f.write(_section.pack(
+                name.encode("ascii"),
+                offset,
+                len(content)
+            ))
+        for name, offset, content in table:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(content)
+
+def _check_header(path, buffer):
+    """
+    Vérifie l'en-tête d'un fichier binaire et retourne son nombre de
+    sections.
+    """
+    if len(buffer) < _header.size:
+        raise InvalidCorpusFile(path, "truncated header")
+    magic, version, byteorder, n_sections = _header.unpack_from(buffer, 0)
+    if magic != _magic:
+        raise InvalidCorpusFile(path, "bad signature")
+    if version != _version:
+        raise InvalidCorpusFile(
+            path,
+            "unsupported version {} (expected {})".format(version, _version)
+        )
+    if byteorder != sys.byteorder[0].encode("ascii"):
+        raise InvalidCorpusFile(path, "byte order mismatch")
+    return n_sections
+
+def check(path):
+    """
+    Vérifie, sans le charger, qu'un fichier binaire peut être lu (signature,
+    version du format et ordre des octets).
+    Lève "InvalidCorpusFile" dans le cas contraire.
+    """
+    with open(path, "rb") as f:
+        _check_header(path, f.read(_header.size))
+
+def _read_sections(path, mm):
+    """
+    Vérifie l'en-tête d'un fichier binaire projeté en mémoire et retourne un
+    dictionnaire associant le nom de chaque section à une vue sur son contenu.
+    """
+    n_sections = _check_header(path, mm)
+    view = memoryview(mm)
+    sections = {}
+    for i in range(n_sections):
+        name, offset, length = _section.unpack_from(
+            mm,
+            _header.size + i * _section.size
+        )
+        if offset + length > len(mm):
+            raise InvalidCorpusFile(path, "truncated section")
+        sections[name.rstrip(b"\0").decode("ascii")] = \
+            view[offset:offset+length]
+    return sections
+
+def load(path):
+    """
+    Projette un fichier binaire en mémoire et retourne le stockage de la
+    traduction qu'il contient (voir "BibleParser.store").
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mtime = os.fstat(f.fileno()).st_mtime
+    sections = _read_sections(path, mm)
+    integers = lambda name: sections[name].cast("I")
+    bible_store = store()
+    bible_store._mmap = mm
+    bible_store.source = (path, mtime)
+    for name in _array_sections:
+        setattr(bible_store, name, integers(name))
+    books = str(sections["books"], "utf-8")
+    bible_store.books = books.split("\n") if books else []
+    bible_store._book_ids = dict(
+        (name, i) for i, name in enumerate(bible_store.books)
+    )
+    sparse = integers("sparse_chapters")
+    for i in range(0, len(sparse), 3):
+        bible_store._sparse_chapters[(sparse[i], sparse[i+1])] = sparse[i+2]
+    sparse = integers("sparse_verses")
+    for i in range(0, len(sparse), 3):
+        bible_store._sparse_verses[(sparse[i], sparse[i+1])] = sparse[i+2]
+    bible_store.texts = _text_table(
+        sections["texts"],
+        integers("text_offsets")
+    )
+    bible_store._folded_texts[(False, False)] = _text_table(
+        sections["folded_texts"],
+        integers("folded_offsets")
+    )
+    terms = str(sections["terms"], "utf-8")
+    terms = terms.split("\n") if terms else []
+    postings = integers("postings")
+    offsets = integers("postings_offsets")
+    positions = integers("positions")
+    position_offsets = integers("position_offsets")
+    bible_store._index = index.from_postings(
+        dict(
+            (term, postings[offsets[i]:offsets[i+1]])
+            for i, term in enumerate(terms)
+        ),
+        # les décalages des rangs d'un terme sont ceux de ses versets, plus
+        # un; ils désignent directement la table complète des rangs
+        dict(
+            (term, (position_offsets[offsets[i]:offsets[i+1]+1], positions))
+            for i, term in enumerate(terms)
+        ),
+        integers("verse_lengths"),
+        sections["number_values"].cast("Q"),
+        integers("number_verses")
+    )
+    return bible_store
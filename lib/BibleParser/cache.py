@@ -0,0 +1,87 @@
+#-*- coding: utf-8 -*-
+
+__all__ = ["cache"]
+
+import threading
+
+from collections import OrderedDict
+
+class cache:
+    """
+    Un cache LRU borné, partagé entre threads.
+    Chaque valeur a un coût (par défaut 1, par exemple le nombre de caractères
+    qu'elle contient): les entrées les moins récemment utilisées sont évincées
+    dès que le nombre d'entrées ou le coût total dépasse sa limite.
+    Les valeurs mises en cache ne doivent plus être modifiées.
+    """
+
+    def __init__(self, max_entries, max_cost=None):
+        self.max_entries = max_entries
+        self.max_cost = max_cost
+        self._entries = OrderedDict()
+        self._cost = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Retourne la valeur associée à une clée, ou "default" en son absence.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value, cost=1):
+        """
+        Associe une valeur à une clée. Une valeur dont le coût dépasse à lui
+        seul la limite n'est pas conservée.
+        """
+        if self.max_cost is not None and cost > self.max_cost:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._cost -= self._entries.pop(key)[1]
+            self._entries[key] = (value, cost)
+            self._cost += cost
+            while len(self._entries) > self.max_entries or \
+                  (self.max_cost is not None and self._cost > self.max_cost):
+                old_value, old_cost = self._entries.popitem(last=False)[1]
+                self._cost -= old_cost
+                self.evictions += 1
+
+    def invalidate(self, predicate=None):
+        """
+        Supprime les entrées dont la clée satisfait le prédicat donné, ou
+        toutes les entrées en son absence.
+        Retourne le nombre d'entrées supprimées.
+        """
+        with self._lock:
+            if predicate is None:
+                keys = list(self._entries)
+            else:
+                keys = [k for k in self._entries if predicate(k)]
+            for k in keys:
+                self._cost -= self._entries.pop(k)[1]
+            return len(keys)
+
+    def get_stats(self):
+        """
+        Retourne les compteurs du cache sous la forme d'un dictionnaire.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "cost": self._cost,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
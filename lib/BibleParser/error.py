@@ -8,7 +8,9 @@ __all__ = [
     "BadReferenceFormat",
     "InvalidBookName",
     "InvalidChapterIndex",
-    "InvalidVerseIndex"
+    "InvalidVerseIndex",
+    "InvalidCorpusFile",
+    "SearchCancelled"
 ]
 
 class BibleParserError(Exception):
@@ -61,3 +63,23 @@ class InvalidVerseIndex(InvalidChapterIndex):
             self.chapter_index,
             self.book_name
         )
+
+class InvalidCorpusFile(BibleParserError):
+    """
+    Erreur de lecture d'un fichier binaire de traduction (voir
+    "BibleParser.binary").
+    """
+    def __init__(self, path, reason):
+        self.path = path
+        self.reason = reason
+
+    def __str__(self):
+        return 'invalid corpus file "{}": {}'.format(self.path, self.reason)
+
+class SearchCancelled(BibleParserError):
+    """
+    Interruption d'une recherche annulée en cours d'itération (voir
+    "BibleParser.query.query.filter").
+    """
+    def __str__(self):
+        return "search cancelled"
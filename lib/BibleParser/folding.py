@@ -0,0 +1,111 @@
+#-*- coding: utf-8 -*-
+"""
+Repliement de la casse et des accents.
+Le repliement se fait caractère par caractère et conserve la longueur du
+texte: une position dans un texte replié est aussi une position dans le texte
+d'origine, ce qui permet de mettre en surbrillance le texte d'origine à partir
+des correspondances trouvées dans sa version repliée.
+"""
+
+__all__ = ["fold", "compile_keyword_regex", "compile_expression_regex"]
+
+import re
+import unicodedata
+
+class _folding_table(dict):
+    """
+    Table de traduction (au sens de "str.translate") complétée à la demande,
+    chaque caractère n'étant examiné qu'une seule fois.
+    """
+
+    # ligatures repliées sur leur première lettre, comme le faisait l'ancienne
+    # table de correspondance des accents
+    _ligatures = {
+        "Æ": "A",
+        "æ": "a"
+    }
+
+    def __init__(self, case_sensitive, accent_sensitive):
+        dict.__init__(self)
+        self.case_sensitive = case_sensitive
+        self.accent_sensitive = accent_sensitive
+
+    def __missing__(self, code):
+        c = chr(code)
+        if not self.accent_sensitive:
+            if c in self._ligatures:
+                c = self._ligatures[c]
+            else:
+                # ne conserve que le caractère de base de la décomposition
+                decomposed = unicodedata.normalize("NFD", c)
+                if all(unicodedata.combining(d) for d in decomposed[1:]):
+                    c = decomposed[0]
+        if not self.case_sensitive:
+            lower = c.lower()
+            # certaines minuscules s'écrivent en plusieurs caractères
+            if len(lower) == 1:
+                c = lower
+        self[code] = c
+        return c
+
+# une table par combinaison de sensibilités
+_tables = dict(
+    ((case_sensitive, accent_sensitive),
+     _folding_table(case_sensitive, accent_sensitive))
+    for case_sensitive in (False, True)
+    for accent_sensitive in (False, True)
+)
+
+def fold(text, case_sensitive=False, accent_sensitive=False):
+    """
+    Replie la casse et/ou les accents d'un texte selon les sensibilités
+    données. Le texte retourné a la même longueur que le texte d'origine.
+    """
+    if case_sensitive and accent_sensitive:
+        return text
+    return text.translate(_tables[(case_sensitive, accent_sensitive)])
+
+def compile_keyword_regex(s,
+                          case_sensitive=False,
+                          accent_sensitive=False,
+                          word_boundary=True):
+    """
+    Compile une expression régulière détectant un mot, éventuellement délimité,
+    dans un texte replié selon les sensibilités données (voir "fold").
+    Le mot est capturé dans le premier groupe.
+    """
+    # Le mot est replié de la même manière que le texte des versets
+    s = re.escape(fold(s, case_sensitive, accent_sensitive))
+    # Délimite le mot à chercher
+    if word_boundary:
+        s = r"\b"+s+r"\b"
+    # Capture du mot dans un groupe
+    return re.compile("("+s+")")
+
+# Masque de découpage d'une expression en mots, identique au découpage des
+# textes en termes de l'index (voir "BibleParser.index")
+_regex_match_word = re.compile(r"\w+")
+
+def compile_expression_regex(s,
+                             case_sensitive=False,
+                             accent_sensitive=False,
+                             word_boundary=True):
+    """
+    Compile une expression régulière détectant une expression exacte: les mots
+    de l'expression, dans l'ordre, séparés par n'importe quels caractères
+    autres que des lettres ou des chiffres (espaces, ponctuation), comme le
+    sont des termes consécutifs de l'index.
+    L'expression est capturée dans le premier groupe.
+    """
+    words = _regex_match_word.findall(fold(s, case_sensitive, accent_sensitive))
+    if not words:
+        return compile_keyword_regex(
+            s,
+            case_sensitive,
+            accent_sensitive,
+            word_boundary
+        )
+    s = r"\W+".join(re.escape(w) for w in words)
+    if word_boundary:
+        s = r"\b"+s+r"\b"
+    return re.compile("("+s+")")
@@ -0,0 +1,307 @@
+#-*- coding: utf-8 -*-
+
+__all__ = ["index"]
+
+import re
+import threading
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from BibleParser.folding import fold
+from BibleParser.Numbers import find_numbers
+
+class index:
+    """
+    Un index inversé associant chaque terme (mot) du texte biblique à la liste
+    triée des identifiants des versets qui le contiennent.
+    Les identifiants de versets sont des entiers consécutifs attribués dans
+    l'ordre canonique du texte.
+    L'index est construit une seule fois par traduction et permet de réduire
+    une recherche par mots-clés aux seuls versets candidats, les expressions
+    régulières n'étant plus exécutées que sur ces derniers.
+    L'index est positionnel: pour chaque verset d'une liste est de plus
+    conservée la liste triée des rangs (à partir de 0) des occurrences du
+    terme parmi les termes du verset, ainsi que le nombre de termes de chaque
+    verset, ce qui permet de reconnaitre une expression (des termes
+    consécutifs) ou des termes proches sans parcourir le texte.
+    Les nombres (écrits en chiffres ou en lettres, voir
+    "BibleParser.Numbers.find_numbers") sont quant à eux rangés dans une
+    table de paires (valeur, verset) triée, qui permet de retrouver les
+    versets contenant un nombre d'un intervalle par dichotomie.
+    """
+
+    # Masque de découpage d'un texte en termes
+    _regex_match_term = re.compile(r"\w+")
+
+    def __init__(self, texts):
+        """
+        Construit l'index à partir d'une suite de textes de versets, l'indice
+        de chaque texte dans la suite devenant l'identifiant du verset.
+        """
+        postings = {}
+        positions = {}
+        verse_lengths = array("I")
+        numbers = []
+        for verse_id, text in enumerate(texts):
+            terms = self._regex_match_term.findall(text)
+            verse_lengths.append(len(terms))
+            # rangs des occurrences de chaque terme du verset
+            verse_positions = {}
+            for rank, term in enumerate(terms):
+                if term in verse_positions:
+                    verse_positions[term].append(rank)
+                else:
+                    verse_positions[term] = [rank]
+            for term, ranks in verse_positions.items():
+                if term in postings:
+                    postings[term].append(verse_id)
+                    offsets, values = positions[term]
+                else:
+                    postings[term] = array("I", (verse_id,))
+                    offsets, values = positions[term] = \
+                        (array("I", (0,)), array("I"))
+                values.extend(ranks)
+                offsets.append(len(values))
+            # les nombres sont reconnus dans le texte replié, ce qui convient
+            # à toutes les sensibilités
+            for value in set(v for v, start, end in find_numbers(fold(text))):
+                numbers.append((value, verse_id))
+        numbers.sort()
+        self._set_postings(
+            postings,
+            positions,
+            verse_lengths,
+            array("Q", (v for v, verse_id in numbers)),
+            array("I", (verse_id for v, verse_id in numbers))
+        )
+
+    @classmethod
+    def from_postings(cls,
+                      postings,
+                      positions,
+                      verse_lengths,
+                      number_values,
+                      number_verses):
+        """
+        Construit un index à partir de listes de versets déjà calculées (voir
+        "BibleParser.binary"), données sous la forme d'un dictionnaire
+        associant chaque terme à une suite triée d'identifiants, des rangs de
+        ses occurrences sous la forme d'un dictionnaire associant chaque terme
+        à une paire (décalages, rangs), les rangs du terme dans le i-ème
+        verset de sa liste étant "rangs[décalages[i]:décalages[i+1]]", du
+        nombre de termes de chaque verset et de la table des nombres sous la
+        forme de deux suites parallèles (valeurs triées, versets).
+        """
+        idx = cls.__new__(cls)
+        idx._set_postings(
+            postings,
+            positions,
+            verse_lengths,
+            number_values,
+            number_verses
+        )
+        return idx
+
+    def _set_postings(self,
+                      postings,
+                      positions,
+                      verse_lengths,
+                      number_values,
+                      number_verses):
+        self.size = len(verse_lengths)
+        self._postings = postings
+        self._positions = positions
+        self.verse_lengths = verse_lengths
+        self._average_length = None
+        self.number_values = number_values
+        self.number_verses = number_verses
+        # vocabulaires repliés, par combinaison de sensibilités; le
+        # vocabulaire insensible à la casse et aux accents sert à la plupart
+        # des recherches et est donc construit immédiatement
+        self._vocabularies = {}
+        self._lock = threading.Lock()
+        self.get_vocabulary(False, False)
+
+    def items(self):
+        """
+        Itère sur les paires (terme, versets) de l'index.
+        """
+        return self._postings.items()
+
+    def positional_items(self):
+        """
+        Itère sur les quadruplets (terme, versets, décalages, rangs) de
+        l'index (voir "from_postings").
+        """
+        for term, verse_ids in self._postings.items():
+            offsets, values = self._positions[term]
+            yield (term, verse_ids, offsets, values)
+
+    def get_vocabulary(self, case_sensitive=True, accent_sensitive=True):
+        """
+        Retourne le vocabulaire de l'index replié selon les sensibilités
+        données, sous la forme d'un dictionnaire associant chaque terme replié
+        à la liste des termes d'origine correspondants.
+        """
+        key = (case_sensitive, accent_sensitive)
+        if key not in self._vocabularies:
+            with self._lock:
+                if key not in self._vocabularies:
+                    vocabulary = {}
+                    for term in self._postings:
+                        folded = fold(term, case_sensitive, accent_sensitive)
+                        if folded in vocabulary:
+                            vocabulary[folded].append(term)
+                        else:
+                            vocabulary[folded] = [term]
+                    self._vocabularies[key] = vocabulary
+        return self._vocabularies[key]
+
+    def get_average_length(self):
+        """
+        Retourne le nombre moyen de termes d'un verset.
+        """
+        if self._average_length is None:
+            self._average_length = sum(self.verse_lengths) / (self.size or 1)
+        return self._average_length or 1
+
+    def get_terms(self, s):
+        """
+        Découpe une chaîne en termes, de la même manière que les textes
+        indexés.
+        """
+        return self._regex_match_term.findall(s)
+
+    def get_postings(self,
+                     term,
+                     case_sensitive=True,
+                     accent_sensitive=True):
+        """
+        Retourne l'ensemble des versets contenant le terme donné, déjà replié
+        selon les sensibilités données.
+        """
+        vocabulary = self.get_vocabulary(case_sensitive, accent_sensitive)
+        verse_ids = set()
+        for original in vocabulary.get(term, ()):
+            verse_ids.update(self._postings[original])
+        return verse_ids
+
+    def get_positions(self,
+                      term,
+                      verse_id,
+                      case_sensitive=True,
+                      accent_sensitive=True):
+        """
+        Retourne la liste triée des rangs des occurrences d'un terme, déjà
+        replié selon les sensibilités données, parmi les termes d'un verset.
+        """
+        vocabulary = self.get_vocabulary(case_sensitive, accent_sensitive)
+        originals = vocabulary.get(term, ())
+        found = []
+        for original in originals:
+            verse_ids = self._postings[original]
+            i = bisect_left(verse_ids, verse_id)
+            if i < len(verse_ids) and verse_ids[i] == verse_id:
+                offsets, values = self._positions[original]
+                found.extend(values[offsets[i]:offsets[i+1]])
+        if len(originals) > 1:
+            found.sort()
+        return found
+
+    def get_phrase(self, terms, case_sensitive=True, accent_sensitive=True):
+        """
+        Retourne l'ensemble des versets dans lesquels les termes donnés, déjà
+        repliés selon les sensibilités données, apparaissent consécutivement
+        et dans l'ordre.
+        Les listes de versets sont d'abord intersectées (de la plus courte à
+        la plus longue), les rangs n'étant consultés que pour les versets
+        restants.
+        """
+        sensitivity = (case_sensitive, accent_sensitive)
+        postings = sorted(
+            (self.get_postings(term, *sensitivity) for term in set(terms)),
+            key=len
+        )
+        verse_ids = postings[0]
+        for other in postings[1:]:
+            verse_ids.intersection_update(other)
+        if len(terms) == 1:
+            return verse_ids
+        found = set()
+        for verse_id in verse_ids:
+            # rangs possibles du premier terme de l'expression
+            starts = set(self.get_positions(terms[0], verse_id, *sensitivity))
+            for i in range(1, len(terms)):
+                starts.intersection_update(
+                    p - i
+                    for p in self.get_positions(terms[i], verse_id, *sensitivity)
+                )
+                if not starts:
+                    break
+            if starts:
+                found.add(verse_id)
+        return found
+
+    def lookup(self, regex, case_sensitive=True, accent_sensitive=True):
+        """
+        Retourne l'ensemble des versets contenant au moins un terme reconnu
+        par l'expression régulière compilée donnée en argument, celle-ci
+        s'appliquant au vocabulaire replié selon les sensibilités données.
+        Le vocabulaire de l'index est parcouru à la place des versets.
+        """
+        verse_ids = set()
+        vocabulary = self.get_vocabulary(case_sensitive, accent_sensitive)
+        for folded, originals in vocabulary.items():
+            if regex.search(folded):
+                for original in originals:
+                    verse_ids.update(self._postings[original])
+        return verse_ids
+
+    def get_numbers(self, low, high):
+        """
+        Retourne l'ensemble des versets contenant un nombre compris entre
+        "low" et "high" (inclus), reconnu dans le texte replié sans
+        sensibilité à la casse ni aux accents.
+        """
+        return set(self.number_verses[
+            bisect_left(self.number_values, low):
+            bisect_right(self.number_values, high)
+        ])
+
+    def select(self, all_of, one_of, none_of):
+        """
+        Combine des ensembles de versets candidats: intersection des ensembles
+        de "all_of", union de ceux de "one_of" et différence avec ceux de
+        "none_of".
+        Chaque ensemble est donné sous la forme d'une paire (versets, exact),
+        "versets" valant None lorsque le mot-clé n'a pas pu être indexé. Seuls
+        les ensembles exacts peuvent être soustraits.
+        Retourne une liste triée d'identifiants ou None lorsqu'aucune
+        restriction n'a pu être déduite de l'index.
+        """
+        selected = None
+        for verse_ids, exact in all_of:
+            if verse_ids is None:
+                continue
+            if selected is None:
+                selected = set(verse_ids)
+            else:
+                selected.intersection_update(verse_ids)
+        if one_of and all(v is not None for v, e in one_of):
+            union = set()
+            for verse_ids, exact in one_of:
+                union.update(verse_ids)
+            if selected is None:
+                selected = union
+            else:
+                selected.intersection_update(union)
+        if selected is None:
+            # seuls des mots interdits peuvent encore restreindre la recherche
+            if not any(v is not None and e for v, e in none_of):
+                return None
+            selected = set(range(self.size))
+        for verse_ids, exact in none_of:
+            if verse_ids is not None and exact:
+                selected.difference_update(verse_ids)
+        return sorted(selected)
@@ -0,0 +1,168 @@
+#-*- coding: utf-8 -*-
+
+__all__ = ["library"]
+
+import os
+import threading
+
+from BibleParser import binary
+from BibleParser.error import InvalidCorpusFile
+from BibleParser.xml import load
+
+class library:
+    """
+    L'ensemble des traductions de la bible disponibles dans un répertoire, sous
+    la forme de fichiers XML ("<traduction>.xml") et/ou de fichiers binaires
+    compilés ("<traduction>.bin", voir "BibleParser.binary").
+    Chaque traduction n'est chargée qu'une seule fois par processus, à la
+    première demande, et son stockage (immuable) est ensuite partagé par tous
+    les threads. Le contenu du fichier XML n'est pas conservé.
+    Un fichier binaire est préféré au fichier XML tant qu'il n'est pas plus
+    ancien que ce dernier.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.translations = sorted(set(
+            f[:-4] for f in os.listdir(directory)
+            if f.endswith(".xml") or f.endswith(".bin")
+        ))
+        self._stores = {}
+        # fichier source et date de modification de chaque traduction chargée
+        self._versions = {}
+        # un verrou par traduction: le chargement d'une traduction ne bloque
+        # pas l'accès aux autres
+        self._locks = dict((t, threading.Lock()) for t in self.translations)
+
+    def get_path(self, translation):
+        """
+        Retourne le chemin du fichier XML d'une traduction.
+        """
+        return os.path.join(self.directory, translation + ".xml")
+
+    def get_binary_path(self, translation):
+        """
+        Retourne le chemin du fichier binaire d'une traduction.
+        """
+        return os.path.join(self.directory, translation + ".bin")
+
+    def has_binary(self, translation):
+        """
+        Indique si une traduction dispose d'un fichier binaire à jour, c'est à
+        dire lisible (un fichier compilé dans une version précédente du format
+        est ignoré, voir "BibleParser.binary.check") et pas plus ancien que son
+        fichier XML s'il existe.
+        """
+        bin_path = self.get_binary_path(translation)
+        if not os.path.exists(bin_path):
+            return False
+        try:
+            binary.check(bin_path)
+        except InvalidCorpusFile:
+            return False
+        xml_path = self.get_path(translation)
+        if not os.path.exists(xml_path):
+            return True
+        return os.path.getmtime(bin_path) >= os.path.getmtime(xml_path)
+
+    def is_loaded(self, translation):
+        """
+        Indique si une traduction a déjà été chargée.
+        """
+        return translation in self._stores
+
+    def get(self, translation):
+        """
+        Retourne le stockage d'une traduction, en le chargeant si ce n'est déjà
+        fait.
+        """
+        if translation not in self._locks:
+            # Vérifie que la traduction existe
+            raise ValueError(
+                "translation '{}' is unavailable".format(translation)
+            )
+        if translation not in self._stores:
+            with self._locks[translation]:
+                if translation not in self._stores:
+                    self._load(translation)
+        return self._stores[translation]
+
+    def _load(self, translation):
+        """
+        Charge une traduction depuis son fichier binaire s'il est à jour,
+        depuis son fichier XML sinon.
+        """
+        if self.has_binary(translation):
+            path = self.get_binary_path(translation)
+            bible_store = binary.load(path)
+        else:
+            path = self.get_path(translation)
+            with open(path, 'r') as xml_file:
+                bible_store = load(xml_file.read())
+        self._versions[translation] = self._get_source_version(path)
+        self._stores[translation] = bible_store
+
+    def _get_source_version(self, path):
+        """
+        Identifie l'état d'un fichier source par son chemin et sa date de
+        modification.
+        """
+        return (path, os.path.getmtime(path))
+
+    def get_version(self, translation):
+        """
+        Retourne l'état du fichier source d'une traduction chargée (voir
+        "refresh"), qui permet par exemple d'invalider un cache.
+        """
+        return self._versions.get(translation)
+
+    def refresh(self):
+        """
+        Recharge les traductions dont le fichier source a changé depuis leur
+        chargement (ou qui disposent désormais d'un fichier binaire à jour).
+        Les parseurs déjà créés continuent de travailler sur l'ancien
+        stockage.
+        Retourne la liste des traductions rechargées.
+        """
+        reloaded = []
+        for translation in list(self._stores):
+            with self._locks[translation]:
+                path, mtime = self._versions[translation]
+                if self.has_binary(translation):
+                    current = self.get_binary_path(translation)
+                else:
+                    current = self.get_path(translation)
+                if not os.path.exists(current) or \
+                   (current, os.path.getmtime(current)) != (path, mtime):
+                    self._load(translation)
+                    reloaded.append(translation)
+        return reloaded
+
+    def preload(self):
+        """
+        Charge toutes les traductions disposant d'un fichier binaire à jour;
+        la projection en mémoire étant quasi-immédiate, ceci peut être fait au
+        démarrage.
+        Retourne la liste des traductions chargées.
+        """
+        loaded = []
+        for translation in self.translations:
+            if self.has_binary(translation):
+                self.get(translation)
+                loaded.append(translation)
+        return loaded
+
+    def compile(self, translation):
+        """
+        Compile le fichier XML d'une traduction en un fichier binaire.
+        Retourne le chemin du fichier écrit.
+        """
+        with open(self.get_path(translation), 'r') as xml_file:
+            bible_store = load(xml_file.read())
+        bin_path = self.get_binary_path(translation)
+        # écrit dans un fichier temporaire pour ne pas altérer un fichier
+        # éventuellement projeté en mémoire par un autre processus
+        tmp_path = bin_path + ".tmp"
+        binary.dump(bible_store, tmp_path)
+        os.replace(tmp_path, bin_path)
+        return bin_path
@@ -0,0 +1,391 @@
+#-*- coding: utf-8 -*-
+"""
+Exécution parallèle des recherches sur plusieurs processus.
+Les versets à examiner sont découpés en blocs de taille fixe, répartis entre
+les processus d'un ensemble ("pool"). Chaque processus ouvre lui-même le
+fichier binaire de la traduction (voir "BibleParser.binary"): la projection en
+mémoire étant partagée par le système, le texte n'est ni recopié ni transmis,
+seuls le sont la requête, les identifiants des versets et les versets
+trouvés.
+Les résultats sont rendus dans l'ordre des blocs, c'est-à-dire dans le même
+ordre qu'une exécution séquentielle. Une recherche classée par pertinence ne
+rapporte de chaque bloc que ses meilleurs versets, fusionnés par le processus
+principal, et un décompte que le nombre de versets trouvés par chapitre.
+"""
+
+__all__ = ["pool"]
+
+import multiprocessing
+import os
+import signal
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from time import perf_counter
+
+from BibleParser import binary
+from BibleParser.error import SearchCancelled
+from BibleParser.query import new_profile, merge_profile, merge_ranking
+
+# stockages ouverts par un processus de travail, par fichier binaire
+_worker_stores = {}
+
+def _init_worker():
+    """
+    Initialise un processus de travail: l'interruption est laissée au
+    processus principal.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _get_worker_store(source):
+    """
+    Retourne le stockage d'un fichier binaire donné sous la forme d'une paire
+    (chemin, date de modification), en l'ouvrant si ce n'est déjà fait, ou None
+    si le fichier a été remplacé depuis.
+    """
+    if source not in _worker_stores:
+        bible_store = binary.load(source[0])
+        if bible_store.source != source:
+            return None
+        # oublie les versions précédentes du même fichier
+        for old in [s for s in _worker_stores if s[0] == source[0]]:
+            del _worker_stores[old]
+        _worker_stores[source] = bible_store
+    return _worker_stores[source]
+
+def _search_block(source, q, verse_ids, profiled=False):
+    """
+    Exécute une requête sur un bloc de versets, dans un processus de travail.
+    Retourne la liste des paires (identifiant, texte) trouvées, ou None si le
+    fichier binaire n'est plus celui du processus principal; si "profiled"
+    est vrai, retourne une paire (liste, profil d'exécution).
+    """
+    bible_store = _get_worker_store(source)
+    if bible_store is None:
+        return None
+    if not profiled:
+        return list(q.filter(bible_store, verse_ids))
+    profile = new_profile()
+    return (list(q.filter(bible_store, verse_ids, None, profile)), profile)
+
+def _rank_block(source, q, verse_ids, criteria, n, profiled=False):
+    """
+    Classe un bloc de versets par pertinence, dans un processus de travail.
+    Retourne la paire (nombre de versets correspondants, classement des "n"
+    meilleurs) de "BibleParser.query.query.score", ou None si le fichier
+    binaire n'est plus celui du processus principal; si "profiled" est vrai,
+    retourne une paire (paire, profil d'exécution).
+    """
+    bible_store = _get_worker_store(source)
+    if bible_store is None:
+        return None
+    if not profiled:
+        return q.score(bible_store, verse_ids, criteria, n)
+    profile = new_profile()
+    return (q.score(bible_store, verse_ids, criteria, n, None, profile),
+            profile)
+
+def _count_block(source, q, verse_ids, profiled=False):
+    """
+    Compte par chapitre les versets correspondants d'un bloc, dans un
+    processus de travail.
+    Retourne le dictionnaire de "BibleParser.query.query.count_chapters", ou
+    None si le fichier binaire n'est plus celui du processus principal; si
+    "profiled" est vrai, retourne une paire (dictionnaire, profil
+    d'exécution).
+    """
+    bible_store = _get_worker_store(source)
+    if bible_store is None:
+        return None
+    if not profiled:
+        return q.count_chapters(bible_store, verse_ids)
+    profile = new_profile()
+    return (q.count_chapters(bible_store, verse_ids, False, None, profile),
+            profile)
+
+class pool:
+    """
+    Un ensemble de processus exécutant les requêtes (voir
+    "BibleParser.query") par blocs de versets.
+    Seuls les stockages issus d'un fichier binaire peuvent être partagés avec
+    les processus de travail; les autres, de même que les recherches portant
+    sur trop peu de versets pour justifier leur découpage, sont traités dans le
+    processus appelant.
+    Un même ensemble peut servir plusieurs threads simultanément.
+    """
+
+    def __init__(self, workers=None, block_size=2048):
+        self.workers = workers or os.cpu_count() or 1
+        self.block_size = block_size
+        # les processus sont créés par copie du processus principal, sans
+        # réexécuter son script
+        self._executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker
+        )
+
+    def start(self):
+        """
+        Démarre les processus de travail, ce qui est préférable avant que le
+        processus principal ne crée ses propres threads.
+        """
+        for f in [self._executor.submit(os.getpid)
+                  for i in range(self.workers)]:
+            f.result()
+
+    def shutdown(self):
+        """
+        Arrête les processus de travail.
+        """
+        self._executor.shutdown(cancel_futures=True)
+
+    def _iter_blocks(self, verse_ids):
+        """
+        Découpe une suite d'identifiants de versets en blocs.
+        """
+        block = []
+        for verse_id in verse_ids:
+            block.append(verse_id)
+            if len(block) >= self.block_size:
+                yield block
+                block = []
+        if block:
+            yield block
+
+    def execute(self, q, bible_store, cancelled=None, profile=None):
+        """
+        Exécute une requête sur un stockage et retourne un à un les versets
+        correspondants sous la forme de paires (référence, texte), comme le
+        ferait "BibleParser.query.query.execute".
+        L'annulation est vérifiée par le processus appelant, avant chaque
+        verset rendu: les blocs en attente sont alors abandonnés, ceux en cours
+        d'examen par un processus de travail étant menés à leur terme.
+        Le profil d'exécution éventuel (voir "BibleParser.query.query.filter")
+        cumule les durées de tous les processus.
+        Est un itérateur.
+        """
+        source = bible_store.source
+        verse_ids = q.iter_verse_ids(bible_store)
+        if profile is not None:
+            start = perf_counter()
+            verse_ids = list(verse_ids)
+            profile["expand"] += perf_counter() - start
+        blocks = self._iter_blocks(verse_ids)
+        first = next(blocks, None)
+        if first is None:
+            return
+        # une recherche ne remplissant pas un bloc n'est pas répartie
+        blocks = chain((first,), blocks)
+        if source is None or len(first) < self.block_size:
+            for block in blocks:
+                for verse_id, text in q.filter(
+                        bible_store,
+                        block,
+                        cancelled,
+                        profile
+                        ):
+                    yield q.get_result(bible_store, verse_id, text)
+            return
+        # au plus deux blocs en attente par processus, de sorte qu'une
+        # itération interrompue n'ait pas fait examiner toute la bible
+        pending = deque()
+        try:
+            for block in blocks:
+                pending.append((
+                    block,
+                    self._executor.submit(
+                        _search_block,
+                        source,
+                        q,
+                        block,
+                        profile is not None
+                    )
+                ))
+                if len(pending) >= 2 * self.workers:
+                    yield from self._collect(
+                        q,
+                        bible_store,
+                        cancelled,
+                        profile,
+                        *pending.popleft()
+                    )
+            while pending:
+                yield from self._collect(
+                    q,
+                    bible_store,
+                    cancelled,
+                    profile,
+                    *pending.popleft()
+                )
+        finally:
+            for block, future in pending:
+                future.cancel()
+
+    def _collect(self, q, bible_store, cancelled, profile, block, future):
+        """
+        Retourne les résultats d'un bloc dès qu'ils sont disponibles, en
+        examinant le bloc dans le processus appelant si le processus de travail
+        n'a pas pu le faire.
+        """
+        if cancelled is not None and cancelled.is_set():
+            raise SearchCancelled()
+        found = future.result()
+        if found is None:
+            found = q.filter(bible_store, block, cancelled, profile)
+        elif profile is not None:
+            found, block_profile = found
+            merge_profile(profile, block_profile)
+        for verse_id, text in found:
+            if cancelled is not None and cancelled.is_set():
+                raise SearchCancelled()
+            yield q.get_result(bible_store, verse_id, text)
+
+    def rank(self, q, bible_store, limit, offset=0, cancelled=None,
+             profile=None):
+        """
+        Exécute une requête sur un stockage en classant les versets par
+        pertinence, comme le ferait "BibleParser.query.query.rank": chaque
+        bloc est classé par un processus de travail, qui n'en retourne que les
+        "offset" + "limit" meilleurs versets; seuls les versets finalement
+        retenus sont mis en surbrillance, dans le processus appelant.
+        L'annulation est vérifiée avant la collecte de chaque bloc.
+        """
+        if bible_store.source is None:
+            return q.rank(bible_store, limit, offset, cancelled, profile)
+        start = perf_counter() if profile is not None else None
+        verse_ids, criteria = q.get_ranking(bible_store)
+        blocks = list(self._iter_blocks(verse_ids))
+        if profile is not None:
+            profile["expand"] += perf_counter() - start
+        n = offset + limit
+        # une recherche ne remplissant pas un bloc n'est pas répartie
+        if len(blocks) < 2:
+            total, ranking = q.score(
+                bible_store,
+                blocks[0] if blocks else (),
+                criteria,
+                n,
+                cancelled,
+                profile
+            )
+            return (total, q.get_ranked_results(
+                bible_store,
+                ranking,
+                offset,
+                profile
+            ))
+        # les classements partiels étant petits, tous les blocs sont soumis
+        # d'emblée
+        pending = [
+            (block, self._executor.submit(
+                _rank_block,
+                bible_store.source,
+                q,
+                block,
+                criteria,
+                n,
+                profile is not None
+            ))
+            for block in blocks
+        ]
+        total = 0
+        rankings = []
+        try:
+            for block, future in pending:
+                if cancelled is not None and cancelled.is_set():
+                    raise SearchCancelled()
+                found = future.result()
+                if found is None:
+                    found = q.score(
+                        bible_store,
+                        block,
+                        criteria,
+                        n,
+                        cancelled,
+                        profile
+                    )
+                elif profile is not None:
+                    found, block_profile = found
+                    merge_profile(profile, block_profile)
+                total += found[0]
+                rankings.append(found[1])
+        finally:
+            for block, future in pending:
+                future.cancel()
+        return (total, q.get_ranked_results(
+            bible_store,
+            merge_ranking(rankings, n),
+            offset,
+            profile
+        ))
+
+    def count(self, q, bible_store, cancelled=None, profile=None):
+        """
+        Exécute une requête sur un stockage en ne comptant que les versets
+        correspondants, par livre et par chapitre, comme le ferait
+        "BibleParser.query.query.count": lorsque les versets doivent être
+        examinés, chaque bloc l'est par un processus de travail, qui n'en
+        retourne que le nombre de versets trouvés par chapitre.
+        L'annulation est vérifiée avant la collecte de chaque bloc.
+        """
+        if bible_store.source is None:
+            return q.count(bible_store, cancelled, profile)
+        start = perf_counter() if profile is not None else None
+        verse_ids, verified = q.get_counting(bible_store)
+        if verified:
+            if profile is not None:
+                verse_ids = list(verse_ids)
+                profile["expand"] += perf_counter() - start
+            return q.get_facets(
+                bible_store,
+                q.count_chapters(bible_store, verse_ids, True, None, profile)
+            )
+        blocks = list(self._iter_blocks(verse_ids))
+        if profile is not None:
+            profile["expand"] += perf_counter() - start
+        # une recherche ne remplissant pas un bloc n'est pas répartie
+        if len(blocks) < 2:
+            return q.get_facets(bible_store, q.count_chapters(
+                bible_store,
+                blocks[0] if blocks else (),
+                False,
+                cancelled,
+                profile
+            ))
+        # les décomptes partiels étant petits, tous les blocs sont soumis
+        # d'emblée
+        pending = [
+            (block, self._executor.submit(
+                _count_block,
+                bible_store.source,
+                q,
+                block,
+                profile is not None
+            ))
+            for block in blocks
+        ]
+        counts = {}
+        try:
+            for block, future in pending:
+                if cancelled is not None and cancelled.is_set():
+                    raise SearchCancelled()
+                found = future.result()
+                if found is None:
+                    found = q.count_chapters(
+                        bible_store,
+                        block,
+                        False,
+                        cancelled,
+                        profile
+                    )
+                elif profile is not None:
+                    found, block_profile = found
+                    merge_profile(profile, block_profile)
+                for row, n in found.items():
+                    counts[row] = counts.get(row, 0) + n
+        finally:
+            for block, future in pending:
+                future.cancel()
+        return q.get_facets(bible_store, counts)
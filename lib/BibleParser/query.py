@@ -0,0 +1,966 @@
+#-*- coding: utf-8 -*-
+
+__all__ = ["query", "new_profile", "merge_profile", "merge_ranking"]
+
+import heapq
+import math
+import re
+
+from itertools import chain
+from time import perf_counter
+
+from BibleParser.abstract import reference
+from BibleParser.error import SearchCancelled
+from BibleParser.folding import fold, compile_keyword_regex
+from BibleParser.Numbers import find_numbers
+
+# clées d'un profil d'exécution (voir "query.filter")
+_profile_keys = ("scanned", "matched", "expand", "match", "highlight")
+
+# paramètres du score de pertinence BM25 (voir "query.score"): saturation de
+# la fréquence d'un mot et poids de la longueur du verset
+_bm25_k1 = 1.2
+_bm25_b = 0.75
+
+def new_profile():
+    """
+    Retourne un profil d'exécution vide.
+    """
+    return dict.fromkeys(_profile_keys, 0)
+
+def merge_profile(profile, other):
+    """
+    Cumule un profil d'exécution dans un autre.
+    """
+    for k in _profile_keys:
+        profile[k] += other[k]
+
+def merge_ranking(rankings, n):
+    """
+    Fusionne des classements partiels (voir "query.score") en un classement
+    des "n" meilleurs versets.
+    """
+    return heapq.nlargest(
+        n,
+        chain.from_iterable(rankings),
+        key=lambda r: (r[0], -r[1])
+    )
+
+def _find_windows(occurrences, n_terms, distance):
+    """
+    Cherche, dans une liste d'occurrences triée dont chaque élément commence
+    par le rang de l'occurrence et le numéro (de 0 à "n_terms"-1) du terme
+    trouvé, les fenêtres d'au plus "distance" rangs d'écart contenant tous les
+    termes.
+    Retourne l'ensemble des indices des occurrences comprises dans au moins
+    une de ces fenêtres.
+    Chaque occurrence est tour à tour le début d'une fenêtre, dont la fin
+    avance avec elle: la liste n'est parcourue qu'une fois.
+    """
+    involved = set()
+    counts = [0] * n_terms
+    present = 0
+    end = 0
+    for start, occurrence in enumerate(occurrences):
+        while end < len(occurrences) and \
+              occurrences[end][0] <= occurrence[0] + distance:
+            term = occurrences[end][1]
+            if not counts[term]:
+                present += 1
+            counts[term] += 1
+            end += 1
+        if present == n_terms:
+            involved.update(range(start, end))
+        # l'occurrence quitte la fenêtre
+        term = occurrence[1]
+        counts[term] -= 1
+        if not counts[term]:
+            present -= 1
+    return involved
+
+class query:
+    """
+    Une recherche compilée, prête à être exécutée sur le stockage d'une
+    traduction (voir "BibleParser.store").
+    Une requête est immuable: elle ne porte que des tuples et des expressions
+    régulières compilées, et son exécution ne modifie ni la requête ni le
+    stockage. Une même requête peut donc être exécutée simultanément depuis
+    plusieurs threads, et sur plusieurs traductions.
+    Les mots-clés sont donnés sous la forme de paires (expression régulière,
+    mot d'origine), et les intervalles de nombres sous la forme de paires
+    (bas, haut), un nombre de l'un des intervalles comptant comme l'un des
+    mots-clés dont au moins un est nécessaire. Les expressions exactes sont
+    données sous la forme de paires (expression régulière, expression
+    d'origine) et sont toutes obligatoires. Les groupes de mots proches sont
+    donnés sous la forme de triplets (mots, distance, débordement sur les
+    versets voisins), voir "BibleParser.abstract.parser.add_proximity".
+    Les références sont données sous la forme de
+    quintuplets (livre, chapitre bas, chapitre haut, verset bas, verset haut)
+    suivant les conventions de "BibleParser.abstract.reference".
+    """
+
+    # Masque de découpage d'un texte en termes, identique à celui de l'index
+    _regex_match_term = re.compile(r"\w+")
+
+    def __init__(self,
+                 references=(),
+                 mandatory_keywords=(),
+                 one_of_keywords=(),
+                 none_of_keywords=(),
+                 number_ranges=(),
+                 exact_expressions=(),
+                 proximities=(),
+                 case_sensitive=False,
+                 accent_sensitive=False,
+                 word_boundary=True,
+                 highlight_prefix=None):
+        self.references = tuple(references)
+        self.mandatory_keywords = tuple(mandatory_keywords)
+        self.one_of_keywords = tuple(one_of_keywords)
+        self.none_of_keywords = tuple(none_of_keywords)
+        self.number_ranges = tuple(number_ranges)
+        self.exact_expressions = tuple(exact_expressions)
+        self.proximities = tuple(proximities)
+        self.case_sensitive = case_sensitive
+        self.accent_sensitive = accent_sensitive
+        self.word_boundary = word_boundary
+        self.highlight_prefix = highlight_prefix
+        self._matcher = self._build_matcher()
+        # termes repliés et distincts de chaque groupe de mots proches; un
+        # groupe sans aucun terme ne restreint pas la recherche
+        proximity_terms = []
+        for words, distance, cross_verses in self.proximities:
+            terms = tuple(dict.fromkeys(
+                term
+                for word in words
+                for term in self._regex_match_term.findall(
+                    fold(word, case_sensitive, accent_sensitive)
+                )
+            ))
+            if terms:
+                proximity_terms.append((terms, distance, cross_verses))
+        self._proximity_terms = tuple(proximity_terms)
+
+    def _get_keyword_candidates(self, idx, keyword):
+        """
+        Retourne une paire (versets, exact) où "versets" est l'ensemble des
+        versets susceptibles de contenir le mot-clé donné (None si le mot-clé
+        ne peut pas être indexé) et "exact" indique si cet ensemble est
+        exactement celui des versets contenant le mot-clé.
+        """
+        if keyword is None:
+            return (None, False)
+        sensitivity = (self.case_sensitive, self.accent_sensitive)
+        folded = fold(keyword, *sensitivity)
+        terms = idx.get_terms(folded)
+        if not terms:
+            return (None, False)
+        # le mot-clé est un terme à part entière
+        if terms == [folded]:
+            if self.word_boundary:
+                return (idx.get_postings(folded, *sensitivity), True)
+            return (
+                idx.lookup(
+                    compile_keyword_regex(keyword, *sensitivity, False),
+                    *sensitivity
+                ),
+                True
+            )
+        # le mot-clé est composé de plusieurs termes: s'il est délimité, ses
+        # termes doivent se suivre dans le verset
+        if self.word_boundary:
+            return (idx.get_phrase(terms, *sensitivity), False)
+        # sinon chacun d'eux doit être présent dans le verset
+        verse_ids = None
+        for term in terms:
+            found = idx.lookup(
+                compile_keyword_regex(term, *sensitivity, False),
+                *sensitivity
+            )
+            if verse_ids is None:
+                verse_ids = found
+            else:
+                verse_ids.intersection_update(found)
+        return (verse_ids, False)
+
+    def _get_expression_candidates(self, idx, expression):
+        """
+        Retourne une paire (versets, exact) pour une expression exacte (voir
+        "_get_keyword_candidates"): les versets où ses termes se suivent,
+        donnés par l'index positionnel.
+        Une expression non délimitée peut commencer ou finir au milieu d'un
+        terme; elle est alors traitée comme un mot-clé.
+        """
+        if not self.word_boundary:
+            return self._get_keyword_candidates(idx, expression)
+        terms = idx.get_terms(
+            fold(expression, self.case_sensitive, self.accent_sensitive)
+        )
+        if not terms:
+            return (None, False)
+        return (
+            idx.get_phrase(terms, self.case_sensitive, self.accent_sensitive),
+            True
+        )
+
+    def _get_proximity_candidates(self, store, idx, terms, distance, cross):
+        """
+        Retourne une paire (versets, exact) pour un groupe de termes proches
+        (voir "_get_keyword_candidates").
+        Les occurrences des termes sont relevées dans l'index positionnel pour
+        chaque verset contenant tous les termes ou, s'ils peuvent déborder sur
+        les versets voisins, pour chaque chapitre contenant tous les termes:
+        les rangs sont alors décalés du nombre de termes des versets
+        précédents du chapitre.
+        """
+        sensitivity = (self.case_sensitive, self.accent_sensitive)
+        postings = [idx.get_postings(t, *sensitivity) for t in terms]
+        if cross:
+            get_unit = lambda verse_id: store.verse_chapters[verse_id]
+        else:
+            get_unit = lambda verse_id: verse_id
+        units = None
+        for verse_ids in postings:
+            found = set(get_unit(verse_id) for verse_id in verse_ids)
+            if units is None:
+                units = found
+            else:
+                units.intersection_update(found)
+        # décalage de chaque verset dans son chapitre
+        chapter_offsets = {}
+        def get_offset(verse_id):
+            if not cross:
+                return 0
+            row = store.verse_chapters[verse_id]
+            if row not in chapter_offsets:
+                offsets = {}
+                offset = 0
+                for v in range(store.chapter_verses[row],
+                               store.chapter_verses[row+1]):
+                    offsets[v] = offset
+                    offset += idx.verse_lengths[v]
+                chapter_offsets[row] = offsets
+            return chapter_offsets[row][verse_id]
+        occurrences = {}
+        for number, term in enumerate(terms):
+            for verse_id in postings[number]:
+                unit = get_unit(verse_id)
+                if unit not in units:
+                    continue
+                offset = get_offset(verse_id)
+                occurrences.setdefault(unit, []).extend(
+                    (offset + p, number, verse_id)
+                    for p in idx.get_positions(term, verse_id, *sensitivity)
+                )
+        verse_ids = set()
+        for found in occurrences.values():
+            found.sort()
+            for i in _find_windows(found, len(terms), distance):
+                verse_ids.add(found[i][2])
+        return (verse_ids, True)
+
+    def _get_number_candidates(self, idx, low, high):
+        """
+        Retourne une paire (versets, exact) pour un intervalle de nombres (voir
+        "_get_keyword_candidates").
+        La table des nombres de l'index est construite sans sensibilité à la
+        casse ni aux accents: les mots d'un nombre n'y sont pas découpés de la
+        même manière que dans un texte sensible ("Trois quarante"), elle ne
+        peut donc servir que pour une recherche insensible.
+        """
+        if self.case_sensitive or self.accent_sensitive:
+            return (None, False)
+        return (idx.get_numbers(low, high), True)
+
+    def _has_keywords(self):
+        """
+        Indique si la requête comporte des mots-clés (ou assimilés).
+        """
+        return bool(self.mandatory_keywords or
+                    self.one_of_keywords or
+                    self.none_of_keywords or
+                    self.number_ranges or
+                    self.exact_expressions or
+                    self._proximity_terms)
+
+    def _get_candidate_sets(self, store, idx):
+        """
+        Retourne les ensembles de versets candidats (voir
+        "_get_keyword_candidates") des mots-clés obligatoires, des expressions
+        exactes et des groupes de mots proches (dans cet ordre), des mots-clés
+        facultatifs et des intervalles de nombres, puis des mots-clés
+        interdits, sous la forme attendue par "BibleParser.index.select".
+        """
+        return (
+            [self._get_keyword_candidates(idx, k)
+             for r, k in self.mandatory_keywords] +
+            [self._get_expression_candidates(idx, e)
+             for r, e in self.exact_expressions] +
+            [self._get_proximity_candidates(store, idx, *p)
+             for p in self._proximity_terms],
+            [self._get_keyword_candidates(idx, k)
+             for r, k in self.one_of_keywords] +
+            [self._get_number_candidates(idx, low, high)
+             for low, high in self.number_ranges],
+            [self._get_keyword_candidates(idx, k)
+             for r, k in self.none_of_keywords]
+        )
+
+    def get_candidates(self, store):
+        """
+        Déduit de l'index la liste triée des versets candidats à la recherche
+        par mots-clés, ou None si la recherche ne peut pas être restreinte.
+        """
+        if not self._has_keywords():
+            return None
+        idx = store.get_index()
+        return idx.select(*self._get_candidate_sets(store, idx))
+
+    def _build_chapter_range(self, store, book_id, ref):
+        """
+        Construit un intervalle dense d'indices de chapitres à partir d'une
+        référence.
+        """
+        book, chapter_low, chapter_high, verse_low, verse_high = ref
+        # Sélectionne tous les chapitres
+        if chapter_low == -1:
+            return range(1, store.get_book_size(book_id)+1)
+        # Sélectionne un intervalle de chapitres
+        elif chapter_high != -1:
+            return range(chapter_low, chapter_high+1)
+        # Sélectionne un seul chapitre
+        return (chapter_low,)
+
+    def _build_verse_range(self, store, chapter_row, ref):
+        """
+        Construit un intervalle dense d'indices de versets à partir d'une
+        référence.
+        """
+        book, chapter_low, chapter_high, verse_low, verse_high = ref
+        # Sélectionne tous les versets du chapitre
+        if verse_low == -1:
+            return range(1, store.get_chapter_size(chapter_row)+1)
+        # Sélectionne un intervalle de versets
+        elif verse_high != -1:
+            return range(verse_low, verse_high+1)
+        # Sélectionne un seul verset
+        return (verse_low,)
+
+    def iter_verse_ids(self, store):
+        """
+        Itère sur les identifiants des versets à examiner: ceux désignés par
+        les références, ou toute la bible en leur absence, restreints aux
+        candidats déduits de l'index.
+        """
+        return self._iter_verse_ids(store, self.get_candidates(store))
+
+    def _iter_verse_ids(self, store, candidates):
+        """
+        Itère sur les identifiants des versets désignés par les références (ou
+        de toute la bible), restreints à une liste triée de candidats (None
+        pour n'en écarter aucun).
+        """
+        # Parcours toute la bible (ou les seuls versets candidats) en cas
+        # d'absence de référence
+        if not self.references:
+            if candidates is None:
+                candidates = range(len(store))
+            for verse_id in candidates:
+                yield verse_id
+            return
+        # Parcours uniquement des références précises
+        if candidates is not None:
+            candidates = set(candidates)
+        for ref in self.references:
+            book_id = store.get_book_id(ref[0])
+            for chapter_index in self._build_chapter_range(store, book_id, ref):
+                chapter_row = store.get_chapter_row(book_id, chapter_index)
+                for verse_index in self._build_verse_range(
+                        store,
+                        chapter_row,
+                        ref
+                        ):
+                    verse_id = store.get_verse_id(chapter_row, verse_index)
+                    if candidates is None or verse_id in candidates:
+                        yield verse_id
+
+    def _build_matcher(self):
+        """
+        Fusionne les expressions régulières de tous les mots-clés en une seule
+        alternative, chaque mot-clé étant capturé dans un groupe nommé d'après
+        sa catégorie ("n" interdit, "a" obligatoire, "e" expression exacte,
+        "o" au moins un) et son rang. Les mots interdits viennent en premier, de sorte qu'ils
+        l'emportent sur une correspondance commençant au même endroit.
+        """
+        alternatives = []
+        for kind, keywords in (("n", self.none_of_keywords),
+                               ("a", self.mandatory_keywords),
+                               ("e", self.exact_expressions),
+                               ("o", self.one_of_keywords)):
+            for i, (r, k) in enumerate(keywords):
+                alternatives.append(
+                    "(?P<{}{}>{})".format(kind, i, r.pattern)
+                )
+        if not alternatives:
+            return None
+        return re.compile("|".join(alternatives))
+
+    def scan(self, verse, counts=None):
+        """
+        Examine le verset donné en argument en une seule passe de l'expression
+        régulière fusionnée (voir "_build_matcher"), qui indique à la fois
+        quels mots-clés sont présents et où.
+        L'argument est une chaîne, repliée selon les sensibilités de la
+        requête.
+        Retourne une paire (concordance, positions) où "positions" est la liste
+        des intervalles (début, fin) des mots-clés obligatoires ou
+        facultatifs trouvés.
+        Une passe unique ne rapporte pas les correspondances qui en
+        chevauchent une autre: lorsqu'une catégorie semble absente alors que
+        d'autres mots-clés ont été trouvés, ses mots-clés sont vérifiés un à
+        un.
+        Les nombres et les mots proches sont reconnus à part (voir
+        "_scan_numbers" et "_scan_proximities").
+        Si "counts" est un dictionnaire, le nombre d'occurrences de chaque
+        mot-clé trouvé y est ajouté, sous le nom de son groupe (les nombres
+        sous le nom "r" et les mots proches sous le nom "p<groupe>.<mot>"):
+        ceci sert au classement par pertinence (voir "score").
+        """
+        near = self._scan_proximities(verse, counts)
+        if near is None:
+            return (False, None)
+        if self._matcher is None and not self.number_ranges:
+            return (True, near)
+        found = set()
+        spans = []
+        if self._matcher is not None:
+            for m in self._matcher.finditer(verse):
+                name = m.lastgroup
+                # mots interdits
+                if name[0] == "n":
+                    return (False, None)
+                found.add(name)
+                spans.append(m.span())
+                if counts is not None:
+                    counts[name] = counts.get(name, 0) + 1
+        numbers = self._scan_numbers(verse)
+        if not spans and not numbers:
+            return (not self.mandatory_keywords and
+                    not self.exact_expressions and
+                    not self.one_of_keywords and
+                    not self.number_ranges,
+                    near)
+        # vérifications complémentaires des mots-clés éventuellement masqués
+        hidden = []
+        # mots étants _tous_ obligatoires
+        for i, (r, k) in enumerate(self.mandatory_keywords):
+            name = "a{}".format(i)
+            if name not in found:
+                if not r.search(verse):
+                    return (False, None)
+                hidden.append((name, r))
+        # expressions exactes, toutes obligatoires
+        for i, (r, e) in enumerate(self.exact_expressions):
+            name = "e{}".format(i)
+            if name not in found:
+                if not r.search(verse):
+                    return (False, None)
+                hidden.append((name, r))
+        # mots dont au moins un est nécessaire
+        if (self.one_of_keywords or self.number_ranges) and not numbers and \
+           not any(name[0] == "o" for name in found):
+            one_found = [
+                ("o{}".format(i), r)
+                for i, (r, k) in enumerate(self.one_of_keywords)
+                if r.search(verse)
+            ]
+            if not one_found:
+                return (False, None)
+            hidden.extend(one_found)
+        # mots interdits
+        for r, k in self.none_of_keywords:
+            if r.search(verse):
+                return (False, None)
+        for name, r in hidden:
+            hidden_spans = [m.span() for m in r.finditer(verse)]
+            spans.extend(hidden_spans)
+            if counts is not None:
+                counts[name] = counts.get(name, 0) + len(hidden_spans)
+        if counts is not None and numbers:
+            counts["r"] = len(numbers)
+        spans.extend(numbers)
+        spans.extend(near)
+        return (True, spans)
+
+    def _scan_proximities(self, verse, counts=None):
+        """
+        Retourne la liste des intervalles (début, fin) des occurrences des
+        mots proches trouvées dans le verset, ou None si l'un des groupes de
+        mots proches n'y est pas.
+        Un groupe pouvant déborder sur les versets voisins ne peut pas être
+        vérifié sur un seul verset: les versets candidats déduits de l'index
+        font alors foi (voir "_get_proximity_candidates"), et toutes les
+        occurrences de ses mots sont retenues.
+        Les occurrences retenues sont comptées dans "counts" (voir "scan").
+        """
+        if not self._proximity_terms:
+            return []
+        tokens = list(self._regex_match_term.finditer(verse))
+        spans = []
+        for group, (terms, distance, cross_verses) in enumerate(
+                self._proximity_terms
+                ):
+            numbers = dict((term, i) for i, term in enumerate(terms))
+            occurrences = [
+                (rank, numbers[m.group()], m.span())
+                for rank, m in enumerate(tokens)
+                if m.group() in numbers
+            ]
+            if cross_verses:
+                involved = range(len(occurrences))
+            else:
+                involved = _find_windows(occurrences, len(terms), distance)
+            if not involved:
+                return None
+            for i in involved:
+                spans.append(occurrences[i][2])
+                if counts is not None:
+                    name = "p{}.{}".format(group, occurrences[i][1])
+                    counts[name] = counts.get(name, 0) + 1
+        return spans
+
+    def _scan_numbers(self, verse):
+        """
+        Retourne la liste des intervalles (début, fin) des nombres du verset
+        compris dans l'un des intervalles de la requête.
+        """
+        if not self.number_ranges:
+            return []
+        return [
+            (start, end)
+            for value, start, end in find_numbers(
+                verse,
+                self.case_sensitive,
+                self.accent_sensitive
+            )
+            if any(low <= value <= high for low, high in self.number_ranges)
+        ]
+
+    def match(self, verse):
+        """
+        Cherche à reconnaitre au moins un mot-clé dans le verset donné en
+        argument.
+        L'argument est une chaîne, repliée selon les sensibilités de la
+        requête.
+        """
+        return self.scan(verse)[0]
+
+    def _apply_highlight(self, text, spans):
+        """
+        Ajoute un préfixe et un suffixe aux intervalles donnés du texte, après
+        avoir fusionné ceux qui se chevauchent.
+        """
+        if not spans:
+            return text
+        spans.sort()
+        # fusionne les correspondances qui se chevauchent
+        merged = [list(spans[0])]
+        for start, end in spans[1:]:
+            if start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        p = self.highlight_prefix
+        parts = []
+        last = 0
+        for start, end in merged:
+            parts.append(text[last:start])
+            parts.append(p + text[start:end] + p)
+            last = end
+        parts.append(text[last:])
+        return "".join(parts)
+
+    def highlight(self, text, folded_text):
+        """
+        Ajoute aux mots-clés trouvés dans le texte un préfixe et un suffixe.
+        Les correspondances sont cherchées dans le texte replié, de même
+        longueur que le texte d'origine, et reportées sur ce dernier.
+        """
+        matched, spans = self.scan(folded_text)
+        return self._apply_highlight(text, spans or [])
+
+    def filter(self, store, verse_ids=None, cancelled=None, profile=None):
+        """
+        Examine les versets donnés par leurs identifiants (par défaut ceux
+        désignés par "iter_verse_ids") et retourne un à un ceux qui
+        correspondent à la requête, sous la forme de paires (identifiant,
+        texte mis en surbrillance).
+        L'argument "cancelled" est un éventuel "threading.Event", consulté
+        avant chaque verset: s'il est levé, l'itération est interrompue par
+        l'exception "SearchCancelled".
+        L'argument "profile" est un éventuel profil d'exécution (voir
+        "new_profile") où sont cumulés le nombre de versets examinés
+        ("scanned") et trouvés ("matched"), ainsi que les durées en secondes de
+        l'expansion des références et de la consultation de l'index
+        ("expand"), de la recherche ("match") et de la mise en surbrillance
+        ("highlight"). Le temps passé hors de l'itérateur n'est pas compté, et
+        l'horloge n'est consultée que pour les versets trouvés.
+        Est un itérateur.
+        """
+        if verse_ids is None:
+            verse_ids = self.iter_verse_ids(store)
+            if profile is not None:
+                start = perf_counter()
+                verse_ids = list(verse_ids)
+                profile["expand"] += perf_counter() - start
+        texts = store.texts
+        folded_texts = store.get_folded_texts(
+            self.case_sensitive,
+            self.accent_sensitive
+        )
+        scanned = 0
+        resumed = perf_counter() if profile is not None else None
+        try:
+            for verse_id in verse_ids:
+                if cancelled is not None and cancelled.is_set():
+                    raise SearchCancelled()
+                scanned += 1
+                text = texts[verse_id]
+                if not text:
+                    continue
+                # barrière de concordance avec les mots-clés et repérage des
+                # correspondances, en une seule passe
+                matched, spans = self.scan(folded_texts[verse_id])
+                if not matched:
+                    continue
+                if profile is not None:
+                    start = perf_counter()
+                    profile["match"] += start - resumed
+                # mise en surbrillance
+                if self.highlight_prefix is not None:
+                    text = self._apply_highlight(text, spans)
+                if profile is not None:
+                    profile["highlight"] += perf_counter() - start
+                    profile["matched"] += 1
+                    resumed = None
+                yield (verse_id, text)
+                if profile is not None:
+                    resumed = perf_counter()
+        finally:
+            if profile is not None:
+                profile["scanned"] += scanned
+                if resumed is not None:
+                    profile["match"] += perf_counter() - resumed
+
+    def _get_idf(self, size, frequency):
+        """
+        Retourne le poids d'un mot présent dans "frequency" versets sur
+        "size": les mots rares comptent davantage que les mots courants.
+        """
+        return math.log(1 + (size - frequency + 0.5) / (frequency + 0.5))
+
+    def get_ranking(self, store):
+        """
+        Prépare le classement des versets par pertinence (voir "score").
+        Retourne une paire (versets à examiner, critères), les critères étant
+        une paire (longueur moyenne d'un verset, poids) où "poids" associe à
+        chaque mot-clé obligatoire ou facultatif, expression exacte, mot proche
+        ou intervalle de nombres, désigné par le nom de son groupe (voir
+        "scan"), un poids déduit du nombre de versets qui le contiennent selon
+        l'index; les versets candidats sont obtenus au passage.
+        """
+        idx = store.get_index()
+        if not self._has_keywords():
+            return (self._iter_verse_ids(store, None),
+                    (idx.get_average_length(), {}))
+        all_of, one_of, none_of = self._get_candidate_sets(store, idx)
+        n_mandatory = len(self.mandatory_keywords)
+        n_exact = len(self.exact_expressions)
+        n_one_of = len(self.one_of_keywords)
+        weighted = []
+        for i in range(n_mandatory):
+            weighted.append(("a{}".format(i), all_of[i][0]))
+        for i in range(n_exact):
+            weighted.append(("e{}".format(i), all_of[n_mandatory+i][0]))
+        for i in range(n_one_of):
+            weighted.append(("o{}".format(i), one_of[i][0]))
+        # les intervalles de nombres comptent ensemble
+        if self.number_ranges:
+            numbers = set()
+            for verse_ids, exact in one_of[n_one_of:]:
+                if verse_ids is None:
+                    numbers = None
+                    break
+                numbers.update(verse_ids)
+            weighted.append(("r", numbers))
+        # chaque mot d'un groupe de mots proches compte pour lui-même
+        for group, (terms, distance, cross_verses) in enumerate(
+                self._proximity_terms
+                ):
+            for i, term in enumerate(terms):
+                weighted.append((
+                    "p{}.{}".format(group, i),
+                    idx.get_postings(
+                        term,
+                        self.case_sensitive,
+                        self.accent_sensitive
+                    )
+                ))
+        weights = {}
+        for name, verse_ids in weighted:
+            # un mot-clé qui n'a pas pu être indexé est considéré comme
+            # présent partout
+            frequency = idx.size if verse_ids is None else len(verse_ids)
+            weights[name] = self._get_idf(idx.size, frequency)
+        return (
+            self._iter_verse_ids(store, idx.select(all_of, one_of, none_of)),
+            (idx.get_average_length(), weights)
+        )
+
+    def score(self, store, verse_ids, criteria, n, cancelled=None,
+              profile=None):
+        """
+        Examine les versets donnés par leurs identifiants et les classe par
+        pertinence selon les critères donnés (voir "get_ranking").
+        Le score d'un verset est celui de BM25: la somme, pour chaque
+        mot-clé, de son poids multiplié par son nombre d'occurrences dans le
+        verset, ce nombre étant saturé et rapporté à la longueur du verset.
+        Les occurrences sont comptées par la passe qui vérifie le verset (voir
+        "scan").
+        Seuls les "n" meilleurs versets sont conservés, dans un tas.
+        Retourne une paire (nombre de versets correspondants, classement) où
+        le classement est la liste des paires (score, identifiant) des "n"
+        meilleurs versets, par score décroissant puis dans l'ordre du texte.
+        L'annulation et le profil d'exécution sont ceux de "filter", le texte
+        des versets n'étant pas encore mis en surbrillance.
+        """
+        average_length, weights = criteria
+        lengths = store.get_index().verse_lengths
+        folded_texts = store.get_folded_texts(
+            self.case_sensitive,
+            self.accent_sensitive
+        )
+        start = perf_counter() if profile is not None else None
+        heap = []
+        matched = 0
+        scanned = 0
+        for verse_id in verse_ids:
+            if cancelled is not None and cancelled.is_set():
+                raise SearchCancelled()
+            scanned += 1
+            folded = folded_texts[verse_id]
+            if not folded:
+                continue
+            counts = {}
+            if not self.scan(folded, counts)[0]:
+                continue
+            matched += 1
+            norm = _bm25_k1 * (
+                1 - _bm25_b + _bm25_b * lengths[verse_id] / average_length
+            )
+            score = 0.0
+            for name, frequency in counts.items():
+                score += weights[name] * frequency * (_bm25_k1 + 1) / \
+                    (frequency + norm)
+            # à score égal, le premier verset dans l'ordre du texte l'emporte
+            item = (score, -verse_id)
+            if len(heap) < n:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        if profile is not None:
+            profile["scanned"] += scanned
+            profile["match"] += perf_counter() - start
+        return (
+            matched,
+            [(score, -verse_id) for score, verse_id in sorted(heap,
+                                                              reverse=True)]
+        )
+
+    def get_ranked_results(self, store, ranking, offset=0, profile=None):
+        """
+        Retourne la liste des triplets (référence, texte mis en surbrillance,
+        score) des versets d'un classement (voir "score"), à partir du rang
+        "offset": seuls ces versets sont lus et mis en surbrillance.
+        """
+        start = perf_counter() if profile is not None else None
+        folded_texts = store.get_folded_texts(
+            self.case_sensitive,
+            self.accent_sensitive
+        )
+        results = []
+        for score, verse_id in ranking[offset:]:
+            text = store.texts[verse_id]
+            if self.highlight_prefix is not None:
+                text = self.highlight(text, folded_texts[verse_id])
+            ref, text = self.get_result(store, verse_id, text)
+            results.append((ref, text, score))
+        if profile is not None:
+            profile["highlight"] += perf_counter() - start
+            profile["matched"] += len(results)
+        return results
+
+    def rank(self, store, limit, offset=0, cancelled=None, profile=None):
+        """
+        Exécute la requête sur un stockage en classant les versets
+        correspondants par pertinence, et retourne une paire (nombre de
+        versets correspondants, résultats) où "résultats" est la liste des
+        triplets (référence, texte, score) des "limit" versets les plus
+        pertinents à partir du rang "offset" (voir "score").
+        """
+        start = perf_counter() if profile is not None else None
+        verse_ids, criteria = self.get_ranking(store)
+        if profile is not None:
+            verse_ids = list(verse_ids)
+            profile["expand"] += perf_counter() - start
+        total, ranking = self.score(
+            store,
+            verse_ids,
+            criteria,
+            offset + limit,
+            cancelled,
+            profile
+        )
+        return (total, self.get_ranked_results(store, ranking, offset, profile))
+
+    def get_counting(self, store):
+        """
+        Prépare le décompte des versets correspondants (voir "count").
+        Retourne une paire (versets à examiner, vérifiés) où "vérifiés" indique
+        que ces versets sont exactement ceux qui correspondent à la requête:
+        c'est le cas lorsque chaque mot-clé (ou assimilé) a pu être recherché
+        dans l'index de manière exacte, de sorte que les versets n'ont pas à
+        être examinés.
+        """
+        if not self._has_keywords():
+            # seuls les versets vides sont écartés
+            texts = store.texts
+            return (
+                (v for v in self._iter_verse_ids(store, None) if texts[v]),
+                True
+            )
+        idx = store.get_index()
+        all_of, one_of, none_of = self._get_candidate_sets(store, idx)
+        verified = all(
+            verse_ids is not None and exact
+            for verse_ids, exact in chain(all_of, one_of, none_of)
+        )
+        verse_ids = self._iter_verse_ids(
+            store,
+            idx.select(all_of, one_of, none_of)
+        )
+        # sans mot-clé obligatoire ni facultatif, les versets retenus sont
+        # tous ceux qui échappent aux mots interdits, y compris les versets
+        # vides, qui ne sont jamais trouvés (voir "filter")
+        if verified and not all_of and not one_of:
+            texts = store.texts
+            verse_ids = (v for v in verse_ids if texts[v])
+        return (verse_ids, verified)
+
+    def count_chapters(self, store, verse_ids, verified=False, cancelled=None,
+                       profile=None):
+        """
+        Compte par chapitre les versets correspondants parmi ceux donnés par
+        leurs identifiants, sans mettre leur texte en surbrillance.
+        Si "verified" est vrai, les versets sont comptés sans être examinés
+        (voir "get_counting").
+        Retourne un dictionnaire associant à chaque ligne de chapitre (voir
+        "BibleParser.store") son nombre de versets correspondants.
+        L'annulation et le profil d'exécution sont ceux de "filter", aucun
+        verset n'étant rendu.
+        """
+        verse_chapters = store.verse_chapters
+        counts = {}
+        if verified:
+            for verse_id in verse_ids:
+                row = verse_chapters[verse_id]
+                counts[row] = counts.get(row, 0) + 1
+            return counts
+        folded_texts = store.get_folded_texts(
+            self.case_sensitive,
+            self.accent_sensitive
+        )
+        start = perf_counter() if profile is not None else None
+        scanned = 0
+        for verse_id in verse_ids:
+            if cancelled is not None and cancelled.is_set():
+                raise SearchCancelled()
+            scanned += 1
+            folded = folded_texts[verse_id]
+            if not folded or not self.scan(folded)[0]:
+                continue
+            row = verse_chapters[verse_id]
+            counts[row] = counts.get(row, 0) + 1
+        if profile is not None:
+            profile["scanned"] += scanned
+            profile["match"] += perf_counter() - start
+        return counts
+
+    def get_facets(self, store, counts):
+        """
+        Regroupe par livre des nombres de versets par chapitre (voir
+        "count_chapters").
+        Retourne une paire (nombre total de versets, livres) où "livres" est la
+        liste, dans l'ordre du texte, des triplets (nom du livre, nombre de
+        versets, liste des paires (numéro de chapitre, nombre de versets)) des
+        livres et des chapitres comptant au moins un verset.
+        """
+        books = []
+        total = 0
+        for row in sorted(counts):
+            book_name = store.books[store.chapter_books[row]]
+            if not books or books[-1][0] != book_name:
+                books.append((book_name, 0, []))
+            name, book_count, chapters = books[-1]
+            chapters.append((store.chapter_numbers[row], counts[row]))
+            books[-1] = (name, book_count + counts[row], chapters)
+            total += counts[row]
+        return (total, books)
+
+    def count(self, store, cancelled=None, profile=None):
+        """
+        Exécute la requête sur un stockage en ne comptant que les versets
+        correspondants, par livre et par chapitre: aucune référence n'est
+        construite et aucun texte n'est mis en surbrillance, ni même examiné
+        lorsque l'index suffit (voir "get_counting").
+        Retourne la paire (nombre total de versets, livres) de "get_facets".
+        """
+        start = perf_counter() if profile is not None else None
+        verse_ids, verified = self.get_counting(store)
+        if profile is not None:
+            verse_ids = list(verse_ids)
+            profile["expand"] += perf_counter() - start
+        return self.get_facets(store, self.count_chapters(
+            store,
+            verse_ids,
+            verified,
+            cancelled,
+            profile
+        ))
+
+    def get_result(self, store, verse_id, text):
+        """
+        Retourne la paire (référence, texte) d'un verset trouvé.
+        """
+        book_name, chapter_index, verse_index = store.get_address(verse_id)
+        return (
+            reference(
+                None,
+                book_name,
+                chapter_index,
+                None,
+                verse_index,
+                None
+            ),
+            text
+        )
+
+    def execute(self, store, cancelled=None, profile=None):
+        """
+        Exécute la requête sur un stockage et retourne un à un les versets
+        correspondants sous la forme de paires (référence, texte).
+        L'exécution peut être annulée et mesurée (voir "filter").
+        Est un itérateur.
+        """
+        for verse_id, text in self.filter(store, None, cancelled, profile):
+            yield self.get_result(store, verse_id, text)
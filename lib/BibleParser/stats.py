@@ -0,0 +1,196 @@
+#-*- coding: utf-8 -*-
+"""
+Mesures de fonctionnement: compteurs, jauges et histogrammes de durées,
+chacun étant identifié par un nom et un ensemble d'étiquettes (par exemple le
+token d'une requête et l'étape mesurée).
+Les mesures peuvent être exportées sous la forme d'un dictionnaire (encodable
+en JSON) ou au format texte de Prometheus.
+"""
+
+__all__ = ["stats"]
+
+import threading
+
+from contextlib import contextmanager
+from time import perf_counter
+
+# bornes supérieures des classes des histogrammes, en secondes
+_default_buckets = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# quantiles estimés pour chaque histogramme
+_quantiles = (0.5, 0.9, 0.99)
+
+class _histogram:
+    """
+    Un histogramme: effectif de chaque classe (la dernière n'étant pas
+    bornée), nombre et somme des valeurs observées.
+    """
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, n_buckets):
+        self.counts = [0] * (n_buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+
+class stats:
+    """
+    Un ensemble de mesures, partagé entre threads.
+    """
+
+    def __init__(self, buckets=_default_buckets):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def _get_key(self, name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def count(self, name, value=1, **labels):
+        """
+        Incrémente un compteur.
+        """
+        key = self._get_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """
+        Fixe la valeur d'une jauge.
+        """
+        key = self._get_key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Ajoute une valeur (une durée en secondes) à un histogramme.
+        """
+        key = self._get_key(name, labels)
+        # recherche linéaire: les classes sont peu nombreuses
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = _histogram(len(self.buckets))
+            h.counts[i] += 1
+            h.count += 1
+            h.sum += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Mesure la durée d'un bloc "with" et l'ajoute à un histogramme.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start, **labels)
+
+    def _get_quantile(self, h, q):
+        """
+        Estime un quantile d'un histogramme par la borne supérieure de la
+        classe qui le contient (None pour la dernière classe).
+        """
+        rank = q * h.count
+        cumulated = 0
+        for i, c in enumerate(h.counts):
+            cumulated += c
+            if cumulated >= rank:
+                return self.buckets[i] if i < len(self.buckets) else None
+        return None
+
+    def get_stats(self):
+        """
+        Retourne toutes les mesures sous la forme d'un dictionnaire: à chaque
+        nom est associée la liste des mesures de ce nom, avec leurs
+        étiquettes.
+        """
+        with self._lock:
+            result = {"counters": {}, "gauges": {}, "histograms": {}}
+            for kind, entries in (("counters", self._counters),
+                                  ("gauges", self._gauges)):
+                for (name, labels), value in sorted(entries.items()):
+                    result[kind].setdefault(name, []).append({
+                        "labels": dict(labels),
+                        "value": value
+                    })
+            for (name, labels), h in sorted(self._histograms.items()):
+                result["histograms"].setdefault(name, []).append({
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum": h.sum,
+                    "quantiles": dict(
+                        (str(q), self._get_quantile(h, q)) for q in _quantiles
+                    )
+                })
+            return result
+
+    def to_prometheus(self, prefix=""):
+        """
+        Retourne toutes les mesures au format texte de Prometheus, chaque nom
+        étant préfixé par "prefix".
+        """
+        def format_labels(labels, extra=()):
+            labels = list(labels) + list(extra)
+            if not labels:
+                return ""
+            return "{" + ",".join(
+                '{}="{}"'.format(
+                    k,
+                    str(v).replace("\\", "\\\\").replace('"', '\\"')
+                )
+                for k, v in labels
+            ) + "}"
+        lines = []
+        with self._lock:
+            for kind, entries in (("counter", self._counters),
+                                  ("gauge", self._gauges)):
+                typed = set()
+                for (name, labels), value in sorted(entries.items()):
+                    if name not in typed:
+                        lines.append("# TYPE {}{} {}".format(prefix, name, kind))
+                        typed.add(name)
+                    lines.append("{}{}{} {}".format(
+                        prefix,
+                        name,
+                        format_labels(labels),
+                        value
+                    ))
+            typed = set()
+            for (name, labels), h in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append("# TYPE {}{} histogram".format(prefix, name))
+                    typed.add(name)
+                cumulated = 0
+                for i, c in enumerate(h.counts):
+                    cumulated += c
+                    bound = repr(self.buckets[i]) \
+                        if i < len(self.buckets) else "+Inf"
+                    lines.append("{}{}_bucket{} {}".format(
+                        prefix,
+                        name,
+                        format_labels(labels, (("le", bound),)),
+                        cumulated
+                    ))
+                lines.append("{}{}_sum{} {}".format(
+                    prefix,
+                    name,
+                    format_labels(labels),
+                    repr(h.sum)
+                ))
+                lines.append("{}{}_count{} {}".format(
+                    prefix,
+                    name,
+                    format_labels(labels),
+                    h.count
+                ))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,231 @@
+#-*- coding: utf-8 -*-
+
+__all__ = ["store"]
+
+import threading
+
+from array import array
+
+from BibleParser.error import *
+from BibleParser.folding import fold
+from BibleParser.index import index
+
+class store:
+    """
+    Un stockage compact, en colonnes, du texte d'une traduction de la bible.
+    Les versets sont numérotés de 0 à N-1 dans l'ordre canonique du texte
+    (leur identifiant). Les livres et les chapitres sont décrits par des
+    tables de décalages:
+        ° "book_chapters[b]" est la ligne du premier chapitre du livre "b"
+          dans la table des chapitres (la ligne suivant le dernier chapitre du
+          dernier livre termine la table)
+        ° "chapter_verses[c]" est l'identifiant du premier verset de la ligne
+          de chapitre "c"
+        ° "chapter_numbers" et "verse_numbers" portent les numéros (attribut
+          "n") des chapitres et des versets
+    L'adressage (livre, chapitre, verset) -> identifiant se fait en temps
+    constant lorsque la numérotation est dense (ce qui est le cas général), les
+    éventuels trous étant recensés à part.
+    Une fois chargé, le stockage n'est plus modifié: il peut être partagé par
+    tous les parseurs (et donc toutes les connexions) de tous les threads. Les
+    données dérivées (textes repliés, index) sont calculées une seule fois, sous
+    verrou.
+    """
+
+    def __init__(self):
+        self.books = []
+        self._book_ids = {}
+        self.book_chapters = array("I", (0,))
+        self.chapter_numbers = array("I")
+        self.chapter_books = array("I")
+        self.chapter_verses = array("I", (0,))
+        self.verse_numbers = array("I")
+        self.verse_chapters = array("I")
+        self.texts = []
+        # adresses ne respectant pas une numérotation dense
+        self._sparse_chapters = {}
+        self._sparse_verses = {}
+        # données dérivées du texte, calculées à la demande
+        self._folded_texts = {}
+        self._index = None
+        self._lock = threading.Lock()
+        # fichier binaire dont le stockage est issu, sous la forme d'une paire
+        # (chemin, date de modification), voir "BibleParser.binary"
+        self.source = None
+
+    def add_book(self, book_name):
+        """
+        Ajoute un livre à la suite des précédents.
+        """
+        self._book_ids[book_name] = len(self.books)
+        self.books.append(book_name)
+        self.book_chapters.append(len(self.chapter_numbers))
+
+    def add_chapter(self, chapter_index):
+        """
+        Ajoute un chapitre à la fin du dernier livre.
+        """
+        book_id = len(self.books) - 1
+        row = len(self.chapter_numbers)
+        if row - self.book_chapters[book_id] != chapter_index - 1:
+            self._sparse_chapters[(book_id, chapter_index)] = row
+        self.chapter_numbers.append(chapter_index)
+        self.chapter_books.append(book_id)
+        self.book_chapters[-1] = row + 1
+        self.chapter_verses.append(len(self.verse_numbers))
+
+    def add_verse(self, verse_index, text):
+        """
+        Ajoute un verset à la fin du dernier chapitre.
+        """
+        row = len(self.chapter_numbers) - 1
+        verse_id = len(self.verse_numbers)
+        if verse_id - self.chapter_verses[row] != verse_index - 1:
+            self._sparse_verses[(row, verse_index)] = verse_id
+        self.verse_numbers.append(verse_index)
+        self.verse_chapters.append(row)
+        self.texts.append(text)
+        self.chapter_verses[-1] = verse_id + 1
+
+    def __len__(self):
+        return len(self.verse_numbers)
+
+    def get_book_id(self, book_name):
+        """
+        Retourne l'identifiant du livre dont le nom est passé en argument.
+        """
+        if book_name not in self._book_ids:
+            raise InvalidBookName(book_name)
+        return self._book_ids[book_name]
+
+    def get_chapter_row(self, book_id, chapter_index):
+        """
+        Retourne la ligne, dans la table des chapitres, du chapitre dont le
+        numéro est passé en argument.
+        """
+        row = self.book_chapters[book_id] + chapter_index - 1
+        if self.book_chapters[book_id] <= row < self.book_chapters[book_id+1] \
+           and self.chapter_numbers[row] == chapter_index:
+            return row
+        if (book_id, chapter_index) in self._sparse_chapters:
+            return self._sparse_chapters[(book_id, chapter_index)]
+        raise InvalidChapterIndex(self.books[book_id], chapter_index)
+
+    def get_verse_id(self, chapter_row, verse_index):
+        """
+        Retourne l'identifiant du verset dont le numéro est passé en argument,
+        dans le chapitre donné par sa ligne.
+        """
+        verse_id = self.chapter_verses[chapter_row] + verse_index - 1
+        if self.chapter_verses[chapter_row] <= verse_id \
+           < self.chapter_verses[chapter_row+1] \
+           and self.verse_numbers[verse_id] == verse_index:
+            return verse_id
+        if (chapter_row, verse_index) in self._sparse_verses:
+            return self._sparse_verses[(chapter_row, verse_index)]
+        raise InvalidVerseIndex(
+            self.books[self.chapter_books[chapter_row]],
+            self.chapter_numbers[chapter_row],
+            verse_index
+        )
+
+    def get_book_size(self, book_id):
+        """
+        Retourne la taille d'un livre (le plus grand numéro de chapitre).
+        """
+        last = self.book_chapters[book_id+1] - 1
+        if last < self.book_chapters[book_id]:
+            return None
+        return self.chapter_numbers[last]
+
+    def get_chapter_size(self, chapter_row):
+        """
+        Retourne la taille d'un chapitre (le plus grand numéro de verset).
+        """
+        last = self.chapter_verses[chapter_row+1] - 1
+        if last < self.chapter_verses[chapter_row]:
+            return None
+        return self.verse_numbers[last]
+
+    def get_verse_id_by_address(self, book_name, chapter_index, verse_index):
+        """
+        Retourne l'identifiant d'un verset désigné par son adresse (nom du
+        livre, numéro de chapitre, numéro de verset), ce qui permet d'aligner
+        plusieurs traductions.
+        Lève une sous-classe de "InvalidReferenceError" si le verset n'existe
+        pas dans cette traduction.
+        """
+        return self.get_verse_id(
+            self.get_chapter_row(self.get_book_id(book_name), chapter_index),
+            verse_index
+        )
+
+    def get_book_verses(self, book_id):
+        """
+        Retourne l'intervalle des identifiants des versets d'un livre.
+        """
+        return range(
+            self.chapter_verses[self.book_chapters[book_id]],
+            self.chapter_verses[self.book_chapters[book_id+1]]
+        )
+
+    def get_window(self, verse_id, before, after):
+        """
+        Retourne les versets entourant un verset, à raison d'au plus "before"
+        versets avant lui et "after" versets après lui, sans sortir de son
+        livre.
+        La fenêtre est calculée à partir des tables de décalages, en un temps
+        proportionnel au nombre de chapitres qu'elle couvre, et retournée sous
+        la forme d'une liste de triplets (ligne de chapitre, premier
+        identifiant, dernier identifiant), un par chapitre, dans l'ordre du
+        texte.
+        """
+        row = self.verse_chapters[verse_id]
+        book_verses = self.get_book_verses(self.chapter_books[row])
+        first = max(book_verses.start, verse_id - before)
+        last = min(book_verses.stop - 1, verse_id + after)
+        window = []
+        while first <= last:
+            row = self.verse_chapters[first]
+            end = min(last, self.chapter_verses[row+1] - 1)
+            window.append((row, first, end))
+            first = end + 1
+        return window
+
+    def get_address(self, verse_id):
+        """
+        Retourne le triplet (nom du livre, numéro de chapitre, numéro de
+        verset) d'un verset.
+        """
+        row = self.verse_chapters[verse_id]
+        return (
+            self.books[self.chapter_books[row]],
+            self.chapter_numbers[row],
+            self.verse_numbers[verse_id]
+        )
+
+    def get_folded_texts(self, case_sensitive, accent_sensitive):
+        """
+        Retourne le texte des versets replié selon les sensibilités données,
+        en le calculant si ce n'est déjà fait.
+        """
+        key = (case_sensitive, accent_sensitive)
+        if key not in self._folded_texts:
+            with self._lock:
+                if key not in self._folded_texts:
+                    self._folded_texts[key] = [
+                        fold(t, case_sensitive, accent_sensitive)
+                        for t in self.texts
+                    ]
+        return self._folded_texts[key]
+
+    def get_index(self):
+        """
+        Retourne l'index inversé des versets, en le construisant si ce n'est
+        déjà fait.
+        """
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = index(self.texts)
+        return self._index
@@ -0,0 +1,24 @@
+#-*- coding: utf-8 -*-
+# Copyright 2013 Nelson HOUILLON <houillon.nelson@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+"""
+Index des fichiers du projet XMLittré: accès direct aux entrées du
+dictionnaire "Le Littré" sans analyser les fichiers XML.
+"""
+
+__version__ = "0.1"
+__author__  = "Nelson HOUILLON <houillon.nelson@gmail.com>"
@@ -0,0 +1,38 @@
+#-*- coding: utf-8 -*-
+"""
+Toutes les erreurs de l'index du Littré.
+"""
+
+__all__ = [
+    "LittreIndexError",
+    "EntryNotFound",
+    "InvalidIndexFile"
+]
+
+class LittreIndexError(Exception):
+    """
+    Classe mère des erreurs.
+    """
+    def __repr__(self):
+        return self.__str__()
+
+class EntryNotFound(LittreIndexError):
+    """
+    Aucune entrée du dictionnaire ne correspond au mot demandé.
+    """
+    def __init__(self, word):
+        self.word = word
+
+    def __str__(self):
+        return 'no entry found for "{}"'.format(self.word)
+
+class InvalidIndexFile(LittreIndexError):
+    """
+    Fichier d'index illisible: signature, version ou structure invalide.
+    """
+    def __init__(self, path, reason):
+        self.path = path
+        self.reason = reason
+
+    def __str__(self):
+        return 'invalid index file "{}": {}'.format(self.path, self.reason)
@@ -0,0 +1,331 @@
+#-*- coding: utf-8 -*-
+"""
+Index des entrées du Littré.
+Les fichiers du projet XMLittré (un fichier XML par lettre de l'alphabet) sont
+parcourus une seule fois pour relever, pour chaque entrée ("<entree>"), son
+mot-vedette normalisé, le fichier qui la contient, sa position et sa longueur
+en octets. Cette table est enregistrée dans un fichier d'index ("littre.idx",
+à côté des fichiers XML) qui est ensuite projeté en mémoire ("mmap").
+Une entrée n'est lue et décodée qu'au moment où elle est demandée, en ne
+lisant que la tranche correspondante de son fichier, lui-même projeté en
+mémoire: une recherche ne coûte qu'une consultation de dictionnaire et le
+texte du Littré n'est jamais chargé en entier.
+L'index contient de plus les mots-vedettes repliés (sans casse ni accents)
+et triés, ce qui permet de compléter un début de mot par une recherche
+dichotomique, ainsi que la graphie d'origine de chaque mot-vedette, à
+afficher.
+
+Organisation du fichier d'index (entiers non signés, dans l'ordre d'octets de
+la machine):
+    ° en-tête: signature (8 octets), version (4 octets), ordre des octets
+      ("l" ou "b", 1 octet), 3 octets de bourrage, nombre de sections (4
+      octets)
+    ° table des sections: nom (16 octets), décalage (8 octets) et longueur
+      (8 octets) de chaque section
+    ° sections, alignées sur 8 octets
+"""
+
+__all__ = ["index", "normalize"]
+
+import bisect
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import xml.etree.ElementTree as ET
+
+from array import array
+from xml.sax.saxutils import unescape
+
+from BibleParser.folding import fold
+from LittreIndex.error import *
+
+_magic = b"LITTRIDX"
+_version = 3
+
+_header = struct.Struct("=8sIc3xI")
+_section = struct.Struct("=16sQQ")
+
+# une entrée complète, ou vide ("<entree ... />")
+_entry_regex = re.compile(
+    rb"<entree\b[^>]*?(?:/>|>.*?</entree>)",
+    re.DOTALL
+)
+_term_regex = re.compile(rb'\sterme="([^"]*)"')
+
+def normalize(word):
+    """
+    Normalise un mot-vedette pour la recherche: les mots-vedettes du Littré
+    étant écrits en majuscules, seule la casse est ignorée (les accents
+    distinguent des mots différents, comme "côte" et "cote").
+    """
+    return word.strip().lower()
+
+class index:
+    """
+    L'index des entrées du Littré d'un répertoire XMLittré.
+    L'index est construit (et enregistré si possible) à la création de
+    l'objet, si le fichier d'index est absent ou plus ancien que l'un des
+    fichiers XML. Il est immuable et peut être partagé par tous les threads.
+    """
+
+    def __init__(self, directory, path=None):
+        self.directory = directory
+        self.path = path or os.path.join(directory, "littre.idx")
+        # fichiers XML projetés en mémoire, ouverts à la demande
+        self._mmaps = {}
+        self._lock = threading.Lock()
+        if self.is_up_to_date():
+            try:
+                with open(self.path, "rb") as f:
+                    self._load(
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    )
+                return
+            except InvalidIndexFile:
+                # index d'une version précédente, reconstruit ci-dessous
+                pass
+        self._load(self.build())
+
+    def get_letter_files(self):
+        """
+        Retourne la liste triée des fichiers XML du répertoire.
+        """
+        return sorted(f for f in os.listdir(self.directory)
+                      if f.endswith(".xml"))
+
+    def is_up_to_date(self):
+        """
+        Indique si le fichier d'index existe et n'est pas plus ancien que les
+        fichiers XML.
+        """
+        if not os.path.exists(self.path):
+            return False
+        mtime = os.path.getmtime(self.path)
+        return all(
+            os.path.getmtime(os.path.join(self.directory, f)) <= mtime
+            for f in self.get_letter_files()
+        )
+
+    def build(self):
+        """
+        Parcourt les fichiers XML, construit l'index et l'enregistre dans le
+        fichier d'index. Celui-ci n'est pas indispensable: si le répertoire
+        n'est pas accessible en écriture, l'index est simplement conservé en
+        mémoire.
+        Retourne le contenu de l'index.
+        """
+        files = self.get_letter_files()
+        entries = []
+        for file_number, name in enumerate(files):
+            with open(os.path.join(self.directory, name), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for m in _entry_regex.finditer(mm):
+                        # mot-vedette, lu dans la balise ouvrante
+                        term = _term_regex.search(
+                            mm,
+                            m.start(),
+                            mm.find(b">", m.start())
+                        )
+                        if term is None:
+                            continue
+                        term = unescape(
+                            str(term.group(1), "utf-8"),
+                            {"&quot;": '"', "&apos;": "'"}
+                        )
+                        entries.append((
+                            normalize(term),
+                            file_number,
+                            m.start(),
+                            m.end() - m.start(),
+                            term.strip()
+                        ))
+        # entrées triées par mot-vedette, dans l'ordre des fichiers pour un
+        # même mot-vedette
+        entries.sort()
+        headwords = []
+        # graphie d'origine de chaque mot-vedette, celle de sa première entrée
+        displayed = []
+        headword_entries = array("I")
+        entry_files = array("I")
+        entry_offsets = array("Q")
+        entry_lengths = array("I")
+        for headword, file_number, offset, length, term in entries:
+            if not headwords or headwords[-1] != headword:
+                headwords.append(headword)
+                displayed.append(term)
+                headword_entries.append(len(entry_files))
+            entry_files.append(file_number)
+            entry_offsets.append(offset)
+            entry_lengths.append(length)
+        headword_entries.append(len(entry_files))
+        # mots-vedettes repliés, triés, et mots-vedettes correspondants
+        folded = sorted(
+            (fold(headword), i) for i, headword in enumerate(headwords)
+        )
+        content = self._dump((
+            ("files", "\n".join(files).encode("utf-8")),
+            ("headwords", "\n".join(headwords).encode("utf-8")),
+            ("displayed", "\n".join(displayed).encode("utf-8")),
+            ("headword_entries", headword_entries),
+            ("folded", "\n".join(f for f, i in folded).encode("utf-8")),
+            ("folded_headwords", array("I", (i for f, i in folded))),
+            ("entry_files", entry_files),
+            ("entry_offsets", entry_offsets),
+            ("entry_lengths", entry_lengths)
+        ))
+        # écrit dans un fichier temporaire pour ne pas altérer un index
+        # éventuellement projeté en mémoire par un autre processus
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+        return content
+
+    def _dump(self, sections):
+        """
+        Assemble l'en-tête, la table des sections et les sections.
+        """
+        content = bytearray(_header.pack(
+            _magic,
+            _version,
+            sys.byteorder[0].encode("ascii"),
+            len(sections)
+        ))
+        offset = _header.size + _section.size * len(sections)
+        table = []
+        for name, data in sections:
+            data = bytes(data)
+            offset += -offset % 8
+            table.append((name, offset, data))
+            offset += len(data)
+        for name, offset, data in table:
+            content += _section.pack(name.encode("ascii"), offset, len(data))
+        for name, offset, data in table:
+            content += b"\0" * (offset - len(content))
+            content += data
+        return bytes(content)
+
+    def _load(self, buffer):
+        """
+        Lit les sections d'un index (projeté en mémoire ou non).
+        """
+        if len(buffer) < _header.size:
+            raise InvalidIndexFile(self.path, "truncated header")
+        magic, version, byteorder, n_sections = _header.unpack_from(buffer, 0)
+        if magic != _magic:
+            raise InvalidIndexFile(self.path, "bad signature")
+        if version != _version:
+            raise InvalidIndexFile(
+                self.path,
+                "unsupported version {} (expected {})".format(
+                    version,
+                    _version
+                )
+            )
+        if byteorder != sys.byteorder[0].encode("ascii"):
+            raise InvalidIndexFile(self.path, "byte order mismatch")
+        view = memoryview(buffer)
+        sections = {}
+        for i in range(n_sections):
+            name, offset, length = _section.unpack_from(
+                buffer,
+                _header.size + i * _section.size
+            )
+            if offset + length > len(buffer):
+                raise InvalidIndexFile(self.path, "truncated section")
+            sections[name.rstrip(b"\0").decode("ascii")] = \
+                view[offset:offset+length]
+        self._buffer = buffer
+        files = str(sections["files"], "utf-8")
+        self.files = files.split("\n") if files else []
+        headwords = str(sections["headwords"], "utf-8")
+        self.headwords = headwords.split("\n") if headwords else []
+        displayed = str(sections["displayed"], "utf-8")
+        self.displayed = displayed.split("\n") if displayed else []
+        self._headword_ids = dict(
+            (headword, i) for i, headword in enumerate(self.headwords)
+        )
+        self._headword_entries = sections["headword_entries"].cast("I")
+        folded = str(sections["folded"], "utf-8")
+        self._folded = folded.split("\n") if folded else []
+        self._folded_headwords = sections["folded_headwords"].cast("I")
+        self._entry_files = sections["entry_files"].cast("I")
+        self._entry_offsets = sections["entry_offsets"].cast("Q")
+        self._entry_lengths = sections["entry_lengths"].cast("I")
+
+    def __len__(self):
+        return len(self._entry_files)
+
+    def __contains__(self, word):
+        return normalize(word) in self._headword_ids
+
+    def _get_mmap(self, file_number):
+        """
+        Retourne la projection en mémoire d'un fichier XML, en l'ouvrant si ce
+        n'est déjà fait.
+        """
+        if file_number not in self._mmaps:
+            with self._lock:
+                if file_number not in self._mmaps:
+                    path = os.path.join(
+                        self.directory,
+                        self.files[file_number]
+                    )
+                    with open(path, "rb") as f:
+                        self._mmaps[file_number] = mmap.mmap(
+                            f.fileno(),
+                            0,
+                            access=mmap.ACCESS_READ
+                        )
+        return self._mmaps[file_number]
+
+    def get_entry_texts(self, word):
+        """
+        Retourne le texte XML des entrées d'un mot, lu directement dans les
+        fichiers XML.
+        Lève "EntryNotFound" si le mot n'a pas d'entrée.
+        """
+        i = self._headword_ids.get(normalize(word))
+        if i is None:
+            raise EntryNotFound(word)
+        texts = []
+        for e in range(self._headword_entries[i],
+                       self._headword_entries[i+1]):
+            offset = self._entry_offsets[e]
+            mm = self._get_mmap(self._entry_files[e])
+            texts.append(
+                str(mm[offset:offset+self._entry_lengths[e]], "utf-8")
+            )
+        return texts
+
+    def get_entries(self, word):
+        """
+        Retourne les noeuds XML ("<entree>") des entrées d'un mot.
+        Lève "EntryNotFound" si le mot n'a pas d'entrée.
+        """
+        return [ET.fromstring(t) for t in self.get_entry_texts(word)]
+
+    def complete(self, prefix, limit=10):
+        """
+        Retourne au plus "limit" mots-vedettes commençant par un préfixe, sans
+        tenir compte de la casse ni des accents, dans leur graphie d'origine
+        et dans l'ordre alphabétique de leur forme repliée.
+        """
+        prefix = fold(normalize(prefix))
+        if not prefix:
+            return []
+        headwords = []
+        i = bisect.bisect_left(self._folded, prefix)
+        while i < len(self._folded) and len(headwords) < limit and \
+              self._folded[i].startswith(prefix):
+            headwords.append(self.displayed[self._folded_headwords[i]])
+            i += 1
+        return headwords
@@ -0,0 +1,72 @@
+#-*- coding: utf-8 -*-
+"""
+Configuration commune des tests: les modules sont importés depuis
+l'arborescence courante ("lib/") plutôt que depuis une version installée, et
+une petite traduction de la bible sert de corpus.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "lib"))
+
+import pytest
+
+from BibleParser import binary
+from BibleParser.xml import load
+
+# une petite traduction: deux livres, un verset vide, des nombres en lettres
+bible_xml = """<?xml version="1.0" encoding="utf-8"?>
+<bible>
+<b n="Genèse">
+<c n="1">
+<v n="1">Au commencement, Dieu créa les cieux et la terre.</v>
+<v n="2">La terre était informe et vide; l'esprit de Dieu se mouvait au-dessus des eaux.</v>
+<v n="3">Dieu dit: Que la lumière soit! Et la lumière fut.</v>
+<v n="4">Dieu vit que la lumière était bonne; et Dieu sépara la lumière d'avec les ténèbres.</v>
+<v n="5"></v>
+</c>
+<c n="2">
+<v n="1">Ainsi furent achevés les cieux et la terre, et toute leur armée.</v>
+<v n="2">Dieu acheva au septième jour son oeuvre, qu'il avait faite.</v>
+<v n="3">Adam vécut cent trente ans, et il engendra un fils.</v>
+</c>
+</b>
+<b n="Exode">
+<c n="1">
+<v n="1">Voici les noms des fils d'Israël, venus en Égypte avec Jacob.</v>
+<v n="2">Ruben, Siméon, Lévi et Juda, dans la terre de Canaan.</v>
+<v n="3">Les personnes issues de Jacob étaient au nombre de soixante-dix.</v>
+</c>
+</b>
+</bible>
+"""
+
+@pytest.fixture
+def xml_store():
+    """
+    Le stockage de la petite traduction, chargé depuis le XML.
+    """
+    return load(bible_xml)
+
+@pytest.fixture
+def binary_store(tmp_path, xml_store):
+    """
+    Le stockage de la petite traduction, compilé puis projeté en mémoire.
+    """
+    path = str(tmp_path / "test.bin")
+    binary.dump(xml_store, path)
+    return binary.load(path)
+
+@pytest.fixture(scope="module")
+def search_pool():
+    """
+    Un ensemble de processus découpant les recherches en très petits blocs,
+    de sorte que même la petite traduction soit répartie.
+    """
+    from BibleParser.parallel import pool
+    search_pool = pool(2, block_size=2)
+    search_pool.start()
+    yield search_pool
+    search_pool.shutdown()
@@ -0,0 +1,37 @@
+#-*- coding: utf-8 -*-
+"""
+Corpus synthétiques des mesures de performance ("bench/corpus.py").
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "bench"))
+
+import corpus
+
+from BibleParser.xml import load
+from LittreIndex.index import index
+
+def test_bible_is_deterministic():
+    assert corpus.generate_bible(3, 4, 5, seed=1) == \
+        corpus.generate_bible(3, 4, 5, seed=1)
+    assert corpus.generate_bible(3, 4, 5, seed=1) != \
+        corpus.generate_bible(3, 4, 5, seed=2)
+
+def test_bible_loads_within_bounds():
+    bible_store = load(corpus.generate_bible(3, 4, 5, seed=0))
+    assert bible_store.books == corpus.books[:3]
+    for book_id in range(len(bible_store.books)):
+        assert 2 <= bible_store.get_book_size(book_id) <= 4
+    assert all(bible_store.texts)
+
+def test_littre_is_deterministic(tmp_path):
+    files = corpus.generate_littre(260, seed=0)
+    assert files == corpus.generate_littre(260, seed=0)
+    assert sorted(files) == [c + ".xml" for c in "abcdefghijklmnopqrstuvwxyz"]
+    corpus.write_littre(str(tmp_path), 260, seed=0)
+    littre = index(str(tmp_path))
+    # quelques mots-vedettes ont plusieurs entrées
+    assert len(littre) >= len(littre.headwords) > 0
@@ -0,0 +1,108 @@
+#-*- coding: utf-8 -*-
+"""
+L'outil en ligne de commande "clibi": recherche unique et traitement par
+lots (une recherche JSON par ligne en entrée, un résultat JSON par ligne en
+sortie).
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import bible_xml
+
+_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def run_clibi(args, stdin=None):
+    env = dict(os.environ, PYTHONPATH=os.path.join(_root, "lib"))
+    return subprocess.run(
+        [sys.executable, os.path.join(_root, "clibi")] + args,
+        input=stdin,
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=60
+    )
+
+@pytest.fixture
+def bible_file(tmp_path):
+    path = tmp_path / "test.xml"
+    path.write_text(bible_xml, encoding="utf-8")
+    return str(path)
+
+_queries = [
+    {"id": 1, "ref": [], "all": ["lumière"]},
+    {"id": 2, "ref": ["Genèse 2"], "one": ["cieux", "cent"]},
+    "not json",
+    {"id": 3, "ref": ["Nulle part 1"]},
+    {"id": 4, "ref": [], "one": ["terre"], "lim": 2},
+    {"id": 5, "ref": [], "non": ["Dieu"], "cnt": True}
+]
+
+def get_batch_input():
+    return "\n".join(
+        q if isinstance(q, str) else json.dumps(q, ensure_ascii=False)
+        for q in _queries
+    ) + "\n\n"
+
+def test_single_query(bible_file):
+    result = run_clibi(["-T", bible_file, "-a", "lumière"])
+    assert result.returncode == 0
+    assert result.stdout.splitlines() == [
+        "Genèse 1.3:\tDieu dit: Que la _lumière_ soit! Et la _lumière_ fut.",
+        "Genèse 1.4:\tDieu vit que la _lumière_ était bonne; et Dieu sépara "
+        "la _lumière_ d'avec les ténèbres."
+    ]
+
+def test_single_query_word_boundary(bible_file):
+    assert run_clibi(["-T", bible_file, "-a", "lum"]).stdout == ""
+    result = run_clibi(["-T", bible_file, "--no-word-boundary", "-a", "lum"])
+    assert len(result.stdout.splitlines()) == 2
+
+def test_single_query_count(bible_file):
+    result = run_clibi(["-T", bible_file, "-o", "terre", "--count"])
+    assert result.returncode == 0
+    assert result.stdout.splitlines() == [
+        "Genèse:\t3",
+        "Genèse 1:\t2",
+        "Genèse 2:\t1",
+        "Exode:\t1",
+        "Exode 1:\t1"
+    ]
+
+def check_batch_output(stdout):
+    lines = [json.loads(line) for line in stdout.splitlines()]
+    assert len(lines) == len(_queries)
+    found, cent, malformed, invalid, ranked, counted = lines
+    assert found["id"] == 1
+    assert [r["ref"] for r in found["res"]] == ["Genèse 1.3", "Genèse 1.4"]
+    assert [r["ref"] for r in cent["res"]] == ["Genèse 2.1", "Genèse 2.3"]
+    assert "err" in malformed and "id" not in malformed
+    assert invalid["id"] == 3 and "err" in invalid and "res" not in invalid
+    assert ranked["tot"] == 4 and ranked["cur"] == 2
+    assert len(ranked["res"]) == 2 and "sco" in ranked["res"][0]
+    # le verset vide n'est pas compté
+    assert counted["tot"] == 5
+
+def test_batch(bible_file):
+    result = run_clibi(["-T", bible_file, "-q", "-"], get_batch_input())
+    assert result.returncode == 0
+    check_batch_output(result.stdout)
+
+def test_batch_jobs(bible_file, tmp_path):
+    output = str(tmp_path / "out.ndjson")
+    result = run_clibi(
+        ["-T", bible_file, "-q", "-", "-j", "3", "-O", output],
+        get_batch_input()
+    )
+    assert result.returncode == 0
+    with open(output) as f:
+        check_batch_output(f.read())
+
+def test_jobs_on_binary(tmp_path, binary_store):
+    result = run_clibi(["-T", binary_store.source[0], "-j", "2", "-a", "Dieu"])
+    assert result.returncode == 0
+    assert len(result.stdout.splitlines()) == 5
@@ -0,0 +1,104 @@
+#-*- coding: utf-8 -*-
+"""
+Décompte des versets trouvés par livre et par chapitre: accord avec la
+recherche complète et la recherche classée, avec ou sans examen des versets,
+avec ou sans ensemble de processus.
+"""
+
+import pytest
+
+from BibleParser.xml import load, parser
+
+_queries = {
+    "all": lambda p: None,
+    "one_of": lambda p: p.add_one_of_keywords(["Dieu", "lumière"]),
+    "mandatory": lambda p: p.add_mandatory_keywords(["la", "terre"]),
+    "none_of": lambda p: p.add_none_of_keywords(["Dieu"]),
+    "one_none": lambda p: (
+        p.add_one_of_keywords(["terre"]),
+        p.add_none_of_keywords(["cieux"])
+    ),
+    "exact": lambda p: p.add_exact_expression("la terre"),
+    "near": lambda p: p.add_proximity(["cieux", "informe"], 8, True),
+    "range": lambda p: p.add_number_in_range(50, 200),
+    "reference": lambda p: (
+        p.add_reference("Genèse 1"),
+        p.add_none_of_keywords(["lumière"])
+    ),
+    # un mot composé et la sensibilité à la casse ne peuvent pas être
+    # comptés par l'index seul: les versets sont alors examinés
+    "phrase": lambda p: p.add_mandatory_keywords(["au-dessus"]),
+    "case_sensitive": lambda p: (
+        p.set_case_sensitivity(True),
+        p.add_one_of_keywords(["La", "Dieu"])
+    ),
+    "partial": lambda p: (
+        p.set_word_boundary(False),
+        p.add_one_of_keywords(["ciel", "lum"])
+    )
+}
+
+def make_parser(bible_store, configure, search_pool=None):
+    p = parser(bible_store)
+    configure(p)
+    if search_pool is not None:
+        p.set_pool(search_pool)
+    return p
+
+def get_facets(bible_store, configure):
+    """
+    Compte par livre et par chapitre les versets de la recherche complète.
+    """
+    books = []
+    for r, t in make_parser(bible_store, configure):
+        if not books or books[-1][0] != r.book:
+            books.append((r.book, 0, []))
+        name, count, chapters = books[-1]
+        if not chapters or chapters[-1][0] != r.chapter_low:
+            chapters.append((r.chapter_low, 0))
+        chapters[-1] = (r.chapter_low, chapters[-1][1] + 1)
+        books[-1] = (name, count + 1, chapters)
+    return (sum(count for name, count, chapters in books), books)
+
+@pytest.mark.parametrize("name", sorted(_queries))
+def test_count_agrees_with_search(xml_store, binary_store, search_pool, name):
+    configure = _queries[name]
+    expected = get_facets(xml_store, configure)
+    assert make_parser(xml_store, configure).count() == expected
+    assert make_parser(binary_store, configure).count() == expected
+    assert make_parser(binary_store, configure, search_pool).count() == \
+        expected
+    assert make_parser(xml_store, configure).rank(1)[0] == expected[0]
+
+def test_count_facets(xml_store):
+    assert make_parser(xml_store, _queries["exact"]).count() == (4, [
+        ("Genèse", 3, [(1, 2), (2, 1)]),
+        ("Exode", 1, [(1, 1)])
+    ])
+
+def test_none_of_only_skips_empty_verses(xml_store, binary_store,
+                                         search_pool):
+    # Genèse 1.5 est vide: il n'est jamais trouvé, donc jamais compté
+    configure = lambda p: (
+        p.add_reference("Genèse 1"),
+        p.add_none_of_keywords(["Dieu"])
+    )
+    assert len(list(make_parser(xml_store, configure))) == 0
+    for bible_store, search_pool in ((xml_store, None),
+                                     (binary_store, None),
+                                     (binary_store, search_pool)):
+        assert make_parser(bible_store, configure, search_pool).count() == \
+            (0, [])
+        assert make_parser(bible_store, _queries["none_of"], search_pool) \
+            .count()[1][0] == ("Genèse", 2, [(2, 2)])
+
+def test_none_of_only_small_corpus():
+    bible_store = load(
+        '<bible><b n="Genèse"><c n="1"><v n="1">Au commencement Dieu</v>'
+        '<v n="2"></v><v n="3">la terre</v></c></b></bible>'
+    )
+    configure = _queries["none_of"]
+    assert len(list(make_parser(bible_store, configure))) == 1
+    assert make_parser(bible_store, configure).rank(10)[0] == 1
+    assert make_parser(bible_store, configure).count() == \
+        (1, [("Genèse", 1, [(1, 1)])])
@@ -0,0 +1,52 @@
+#-*- coding: utf-8 -*-
+"""
+Index des entrées du Littré: consultation et complétion des mots-vedettes.
+"""
+
+import pytest
+
+from LittreIndex.error import EntryNotFound
+from LittreIndex.index import index
+
+_entries = {
+    "a.xml": [("ABAISSER", "v. a."), ("ABAISSEMENT", "s. m."),
+              ("ÂGE", "s. m."), ("Aaron", "s. m.")],
+    "c.xml": [("CÔTE", "s. f."), ("COTE", "s. f.")]
+}
+
+@pytest.fixture
+def littre(tmp_path):
+    for name, entries in _entries.items():
+        (tmp_path / name).write_text(
+            '<?xml version="1.0" encoding="UTF-8"?>\n<xmlittre>\n' + "".join(
+                '<entree terme="{}"><entete><nature>{}</nature></entete>'
+                '<corps>...</corps></entree>\n'.format(term, nature)
+                for term, nature in entries
+            ) + "</xmlittre>\n",
+            encoding="utf-8"
+        )
+    return index(str(tmp_path))
+
+def test_lookup(littre):
+    assert len(littre) == 6
+    assert "abaisser" in littre
+    [entry] = littre.get_entries("Abaisser")
+    assert entry.get("terme") == "ABAISSER"
+    with pytest.raises(EntryNotFound):
+        littre.get_entries("abaque")
+
+def test_accents_distinguish_headwords(littre):
+    assert littre.get_entries("côte")[0].get("terme") == "CÔTE"
+    assert littre.get_entries("cote")[0].get("terme") == "COTE"
+
+def test_complete_returns_original_headwords(littre):
+    assert littre.complete("aba") == ["ABAISSEMENT", "ABAISSER"]
+    assert littre.complete("aa") == ["Aaron"]
+    # sans tenir compte des accents
+    assert littre.complete("age") == ["ÂGE"]
+    assert littre.complete("a", 2) == ["Aaron", "ABAISSEMENT"]
+    assert littre.complete("") == []
+
+def test_reload_from_index_file(littre):
+    reloaded = index(littre.directory)
+    assert reloaded.complete("cot") == littre.complete("cot")
@@ -0,0 +1,36 @@
+#-*- coding: utf-8 -*-
+"""
+Reconnaissance des nombres écrits en chiffres ou en lettres.
+"""
+
+from BibleParser.folding import fold
+from BibleParser.Numbers import find_numbers
+
+def numbers(text, case_sensitive=False, accent_sensitive=False):
+    return [
+        value
+        for value, start, end in find_numbers(
+            fold(text, case_sensitive, accent_sensitive),
+            case_sensitive,
+            accent_sensitive
+        )
+    ]
+
+def test_words_and_digits():
+    assert numbers("trois cents hommes et 40 femmes") == [300, 40]
+
+def test_compound():
+    assert numbers("quatre-vingt-dix-neuf brebis") == [99]
+    assert numbers("deux mille trois cent vingt et un") == [2321]
+
+def test_capitalised_insensitive():
+    assert numbers("Trois cents hommes") == [300]
+
+def test_capitalised_case_sensitive():
+    # le nombre entier est écarté: "cents" ne compte pas pour 100
+    assert numbers("Trois cents hommes", case_sensitive=True) == []
+    assert numbers("trois cents hommes", case_sensitive=True) == [300]
+
+def test_conjunction_case_sensitive():
+    # "Et" en tête de phrase n'écarte pas le nombre qui le suit
+    assert numbers("Et cent hommes", case_sensitive=True) == [100]
@@ -0,0 +1,157 @@
+#-*- coding: utf-8 -*-
+"""
+Index positionnel: format binaire (version 3), choix du fichier binaire par
+la bibliothèque de traductions, expressions exactes et mots proches.
+"""
+
+import os
+import struct
+
+import pytest
+
+from conftest import bible_xml
+
+from BibleParser import binary
+from BibleParser.error import InvalidCorpusFile
+from BibleParser.library import library
+from BibleParser.xml import parser
+
+def search(bible_store, configure):
+    p = parser(bible_store)
+    configure(p)
+    return [(str(r), t) for r, t in p]
+
+def refs(bible_store, configure):
+    return [r for r, t in search(bible_store, configure)]
+
+def test_binary_round_trip(xml_store, binary_store):
+    assert binary_store.books == xml_store.books
+    assert list(binary_store.texts) == list(xml_store.texts)
+    xml_index = xml_store.get_index()
+    binary_index = binary_store.get_index()
+    assert list(binary_index.verse_lengths) == list(xml_index.verse_lengths)
+    for term, verse_ids, offsets, values in xml_index.positional_items():
+        assert binary_index.get_postings(term) == set(verse_ids)
+        for verse_id in verse_ids:
+            assert binary_index.get_positions(term, verse_id) == \
+                xml_index.get_positions(term, verse_id)
+
+def test_binary_sections(binary_store):
+    path = binary_store.source[0]
+    with open(path, "rb") as f:
+        content = f.read()
+    magic, version, byteorder, n_sections = \
+        struct.unpack_from("=8sIc3xI", content, 0)
+    assert (magic, version) == (b"BIBLEBIN", 3)
+    names = set()
+    for i in range(n_sections):
+        name, offset, length = struct.unpack_from("=16sQQ", content, 20 + 32*i)
+        assert offset % 8 == 0 and offset + length <= len(content)
+        names.add(name.rstrip(b"\0").decode("ascii"))
+    assert {"position_offsets", "positions", "verse_lengths"} <= names
+
+def test_binary_older_version(tmp_path, binary_store):
+    path = str(tmp_path / "old.bin")
+    with open(binary_store.source[0], "rb") as f:
+        content = bytearray(f.read())
+    struct.pack_into("=I", content, 8, 2)
+    with open(path, "wb") as f:
+        f.write(content)
+    with pytest.raises(InvalidCorpusFile):
+        binary.check(path)
+    with pytest.raises(InvalidCorpusFile):
+        binary.load(path)
+
+def test_library_prefers_binary(tmp_path):
+    xml_path = tmp_path / "test.xml"
+    xml_path.write_text(bible_xml, encoding="utf-8")
+    bible_library = library(str(tmp_path))
+    assert bible_library.translations == ["test"]
+    assert not bible_library.has_binary("test")
+    bible_library.get("test")
+    assert bible_library.get_version("test")[0] == str(xml_path)
+    # un fichier binaire à jour est préféré au XML
+    bin_path = bible_library.compile("test")
+    assert bible_library.has_binary("test")
+    assert bible_library.refresh() == ["test"]
+    assert bible_library.get_version("test")[0] == bin_path
+    assert bible_library.get("test").source is not None
+    assert bible_library.refresh() == []
+    # un XML plus récent rend le fichier binaire périmé
+    mtime = os.path.getmtime(bin_path)
+    os.utime(str(xml_path), (mtime + 10, mtime + 10))
+    assert not bible_library.has_binary("test")
+    assert bible_library.refresh() == ["test"]
+    assert bible_library.get_version("test")[0] == str(xml_path)
+
+def test_library_ignores_older_binary(tmp_path, binary_store):
+    (tmp_path / "test.xml").write_text(bible_xml, encoding="utf-8")
+    bin_path = str(tmp_path / "test.bin")
+    with open(binary_store.source[0], "rb") as f:
+        content = bytearray(f.read())
+    struct.pack_into("=I", content, 8, 2)
+    with open(bin_path, "wb") as f:
+        f.write(content)
+    bible_library = library(str(tmp_path))
+    assert not bible_library.has_binary("test")
+    assert bible_library.get("test").source is None
+
+@pytest.mark.parametrize("store_name", ["xml_store", "binary_store"])
+def test_exact_expression(request, store_name):
+    bible_store = request.getfixturevalue(store_name)
+    assert refs(bible_store, lambda p: p.add_exact_expression("la terre")) == [
+        "Genèse 1.1", "Genèse 1.2", "Genèse 2.1", "Exode 1.2"
+    ]
+    # la ponctuation entre les mots est sans importance
+    assert refs(bible_store, lambda p: p.add_exact_expression("dit que")) \
+        == ["Genèse 1.3"]
+    assert refs(bible_store, lambda p: p.add_exact_expression("terre la")) \
+        == []
+
+def test_exact_expression_is_mandatory(xml_store):
+    # une expression exacte est obligatoire, et non plus l'un des mots-clés
+    # dont au moins un est nécessaire: combinée à des mots facultatifs, elle
+    # restreint la recherche au lieu de l'élargir
+    assert refs(xml_store, lambda p: (
+        p.add_exact_expression("la terre"),
+        p.add_one_of_keywords(["cieux", "Canaan"])
+    )) == ["Genèse 1.1", "Genèse 2.1", "Exode 1.2"]
+    assert refs(xml_store, lambda p: (
+        p.add_exact_expression("la terre"),
+        p.add_one_of_keywords(["Jacob"])
+    )) == []
+
+def test_exact_expression_highlight(xml_store):
+    assert search(xml_store, lambda p: (
+        p.enable_highlighting("_"),
+        p.add_reference("Genèse 1.3"),
+        p.add_exact_expression("la lumière")
+    )) == [(
+        "Genèse 1.3",
+        "Dieu dit: Que _la lumière_ soit! Et _la lumière_ fut."
+    )]
+
+@pytest.mark.parametrize("store_name", ["xml_store", "binary_store"])
+def test_proximity(request, store_name):
+    bible_store = request.getfixturevalue(store_name)
+    near = ["Dieu", "lumière"]
+    assert refs(bible_store, lambda p: p.add_proximity(near, 2)) == []
+    assert refs(bible_store, lambda p: p.add_proximity(near, 3)) == [
+        "Genèse 1.4"
+    ]
+    assert refs(bible_store, lambda p: p.add_proximity(near, 4)) == [
+        "Genèse 1.3", "Genèse 1.4"
+    ]
+    # l'ordre des mots est indifférent
+    assert refs(bible_store, lambda p: p.add_proximity(["terre", "cieux"], 3)) \
+        == ["Genèse 1.1", "Genèse 2.1"]
+
+@pytest.mark.parametrize("store_name", ["xml_store", "binary_store"])
+def test_proximity_across_verses(request, store_name):
+    bible_store = request.getfixturevalue(store_name)
+    near = ["cieux", "informe"]
+    assert refs(bible_store, lambda p: p.add_proximity(near, 8)) == []
+    assert refs(bible_store, lambda p: p.add_proximity(near, 8, True)) == [
+        "Genèse 1.1", "Genèse 1.2"
+    ]
+    assert refs(bible_store, lambda p: p.add_proximity(near, 6, True)) == []
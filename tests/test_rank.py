@@ -0,0 +1,87 @@
+#-*- coding: utf-8 -*-
+"""
+Recherche classée par pertinence: accord avec la recherche complète,
+pagination et classement par un ensemble de processus.
+"""
+
+import pytest
+
+from BibleParser.query import new_profile
+from BibleParser.xml import parser
+
+_queries = {
+    "one_of": lambda p: p.add_one_of_keywords(["Dieu", "lumière"]),
+    "mandatory": lambda p: p.add_mandatory_keywords(["la", "terre"]),
+    "none_of": lambda p: p.add_none_of_keywords(["Dieu"]),
+    "exact": lambda p: p.add_exact_expression("la terre"),
+    "near": lambda p: p.add_proximity(["cieux", "terre"], 3),
+    "range": lambda p: p.add_number_in_range(50, 200),
+    "reference": lambda p: p.add_reference("Genèse 1")
+}
+
+def make_parser(bible_store, configure, search_pool=None):
+    p = parser(bible_store)
+    p.enable_highlighting("_")
+    configure(p)
+    if search_pool is not None:
+        p.set_pool(search_pool)
+    return p
+
+def ranked(bible_store, configure, limit, offset=0, search_pool=None):
+    total, results = make_parser(bible_store, configure, search_pool).rank(
+        limit,
+        offset
+    )
+    return (total, [(str(r), t, s) for r, t, s in results])
+
+@pytest.mark.parametrize("name", sorted(_queries))
+def test_rank_agrees_with_search(xml_store, name):
+    configure = _queries[name]
+    found = dict((str(r), t) for r, t in make_parser(xml_store, configure))
+    total, results = ranked(xml_store, configure, 100)
+    assert total == len(found)
+    assert dict((r, t) for r, t, s in results) == found
+    scores = [s for r, t, s in results]
+    assert scores == sorted(scores, reverse=True)
+
+def test_rank_order(xml_store):
+    total, results = ranked(xml_store, _queries["one_of"], 3)
+    assert total == 5
+    # le mot le plus rare, présent deux fois, l'emporte sur le plus courant
+    assert set(r for r, t, s in results[:2]) == {"Genèse 1.3", "Genèse 1.4"}
+    assert all(t.count("_lumière_") == 2 for r, t, s in results[:2])
+    assert "_lumière_" not in results[2][1]
+
+def test_rank_ties_in_text_order(xml_store):
+    total, results = ranked(xml_store, _queries["reference"], 10)
+    assert total == 4
+    assert [r for r, t, s in results] == [
+        "Genèse 1.1", "Genèse 1.2", "Genèse 1.3", "Genèse 1.4"
+    ]
+
+@pytest.mark.parametrize("name", sorted(_queries))
+def test_rank_pages(xml_store, name):
+    configure = _queries[name]
+    total, results = ranked(xml_store, configure, 100)
+    pages = []
+    for offset in range(0, total, 2):
+        page_total, page = ranked(xml_store, configure, 2, offset)
+        assert page_total == total
+        pages.extend(page)
+    assert pages == results
+
+@pytest.mark.parametrize("name", sorted(_queries))
+def test_rank_pool(xml_store, binary_store, search_pool, name):
+    configure = _queries[name]
+    expected = ranked(xml_store, configure, 3, 1)
+    assert ranked(binary_store, configure, 3, 1) == expected
+    assert ranked(binary_store, configure, 3, 1, search_pool) == expected
+
+def test_rank_profile(binary_store, search_pool):
+    profile = new_profile()
+    p = make_parser(binary_store, _queries["one_of"], search_pool)
+    p.set_profile(profile)
+    total, results = p.rank(2)
+    # seuls les versets retournés sont mis en surbrillance
+    assert profile["matched"] == len(results) == 2
+    assert profile["scanned"] == total == 5
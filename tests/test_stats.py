@@ -0,0 +1,66 @@
+#-*- coding: utf-8 -*-
+"""
+Mesures de fonctionnement et profils d'exécution des recherches.
+"""
+
+from BibleParser.query import new_profile
+from BibleParser.stats import stats
+from BibleParser.xml import parser
+
+def test_counters_and_gauges():
+    s = stats()
+    s.count("requests_total", token="search")
+    s.count("requests_total", 2, token="search")
+    s.count("requests_total", token="context")
+    s.set("translations_loaded", 3)
+    result = s.get_stats()
+    assert result["counters"]["requests_total"] == [
+        {"labels": {"token": "context"}, "value": 1},
+        {"labels": {"token": "search"}, "value": 3}
+    ]
+    assert result["gauges"]["translations_loaded"] == [
+        {"labels": {}, "value": 3}
+    ]
+
+def test_histogram_quantiles():
+    s = stats(buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        s.observe("request_seconds", value, token="search")
+    [h] = s.get_stats()["histograms"]["request_seconds"]
+    assert h["count"] == 4
+    assert h["sum"] == 5.6
+    # le dernier quantile tombe dans la classe non bornée
+    assert h["quantiles"] == {"0.5": 0.1, "0.9": None, "0.99": None}
+
+def test_prometheus():
+    s = stats(buckets=(0.1, 1.0))
+    s.count("requests_total", token='a"b')
+    s.observe("request_seconds", 0.5, token="search")
+    text = s.to_prometheus("concordance_")
+    assert '# TYPE concordance_requests_total counter' in text
+    assert 'concordance_requests_total{token="a\\"b"} 1' in text
+    assert 'concordance_request_seconds_bucket{token="search",le="0.1"} 0' \
+        in text
+    assert 'concordance_request_seconds_bucket{token="search",le="+Inf"} 1' \
+        in text
+    assert 'concordance_request_seconds_count{token="search"} 1' in text
+
+def test_timer():
+    s = stats()
+    with s.timer("stage_seconds", stage="decode"):
+        pass
+    [h] = s.get_stats()["histograms"]["stage_seconds"]
+    assert h["count"] == 1 and h["labels"] == {"stage": "decode"}
+
+def test_search_profile(xml_store):
+    profile = new_profile()
+    p = parser(xml_store)
+    p.set_profile(profile)
+    p.add_mandatory_keywords(["lumière"])
+    p.enable_highlighting("_")
+    found = list(p)
+    assert len(found) == 2
+    assert profile["matched"] == 2
+    # seuls les candidats de l'index sont examinés
+    assert profile["scanned"] == 2
+    assert all(profile[k] >= 0 for k in ("expand", "match", "highlight"))